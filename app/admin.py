@@ -1,18 +1,41 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.admin import ModelAdmin
+from django.db.models import Count
 
-from .models import MyUser, Profile, Backpack, Category, Subcategory, Brand, Product, Review
+from .models import MyUser, Profile, Backpack, Category, Subcategory, Brand, Product, Review, QueuedEmail, \
+    HourlyStats
 from django.contrib.sessions.models import Session
 from simple_history.admin import SimpleHistoryAdmin
 
+from .paginators import EstimatedCountPaginator
 
-class SessionAdmin(ModelAdmin):
+
+class LargeTableAdmin:
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ChangelistDeferAdmin:
+    """fields not needed on changelist, like big json fields, are loaded only on change page"""
+    changelist_defer = []
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        opts = self.model._meta
+        if request.resolver_match and \
+                request.resolver_match.url_name == f'{opts.app_label}_{opts.model_name}_changelist':
+            queryset = queryset.defer(*self.changelist_defer)
+        return queryset
+
+
+class SessionAdmin(LargeTableAdmin, ModelAdmin):
     @staticmethod
     def _session_data(obj):
         return obj.get_decoded()
 
-    list_display = ['session_key', '_session_data', 'expire_date']
+    list_display = ['session_key', 'expire_date']  # session data is decoded only on change page
+    readonly_fields = ['_session_data']
 
 
 class MyUserAdmin(UserAdmin):
@@ -37,17 +60,39 @@ class CreatedUpdatedAdmin:
     readonly_fields = ['updated', 'created']
 
 
-class BackpackAdmin(CreatedUpdatedAdmin, ModelAdmin):
+class BackpackAdmin(CreatedUpdatedAdmin, LargeTableAdmin, ChangelistDeferAdmin, ModelAdmin):
     list_display = ['name', 'description', 'profile', 'created', 'updated', 'shared']
     list_filter = ['created', 'updated', 'shared']
+    list_select_related = ['profile__user']
+    changelist_defer = ['list', 'summary']
 
 
-class ProfileAdmin(ModelAdmin):
-    @staticmethod
-    def _backpacks_amount(obj):
-        return len(obj.backpacks.all())
+class ProfileAdmin(ChangelistDeferAdmin, ModelAdmin):
+    def _backpacks_amount(self, obj):
+        return obj.backpacks_amount
 
+    _backpacks_amount.admin_order_field = 'backpacks_amount'
     list_display = ['user', '_backpacks_amount']
+    list_select_related = ['user']
+    changelist_defer = ['private_gear']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(backpacks_amount=Count('backpacks'))
+
+
+class QueuedEmailAdmin(CreatedUpdatedAdmin, ModelAdmin):
+    list_display = ['subject', 'recipients', 'created', 'sent', 'attempts', 'next_attempt']
+    list_filter = ['sent', 'created']
+
+
+class CatalogHistoryAdmin(LargeTableAdmin, SimpleHistoryAdmin):
+    pass
+
+
+class HourlyStatsAdmin(ModelAdmin):
+    list_display = ['hour'] + HourlyStats.COUNTERS
+    date_hierarchy = 'hour'
+    ordering = ['-hour']
 
 
 admin.site.register(Session, SessionAdmin)
@@ -57,5 +102,7 @@ admin.site.register(Backpack, BackpackAdmin)
 admin.site.register(Category)
 admin.site.register(Subcategory)
 admin.site.register(Brand, SimpleHistoryAdmin)
-admin.site.register(Product, SimpleHistoryAdmin)
-admin.site.register(Review, SimpleHistoryAdmin)
+admin.site.register(Product, CatalogHistoryAdmin)
+admin.site.register(Review, CatalogHistoryAdmin)
+admin.site.register(QueuedEmail, QueuedEmailAdmin)
+admin.site.register(HourlyStats, HourlyStatsAdmin)
@@ -0,0 +1,45 @@
+def to_number(value, default=0):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def summarize_backpack_list(backpack_list):
+    """weights in grams, worn and consumable items are excluded from base weight"""
+    summary = {
+        'total_weight': 0,
+        'base_weight': 0,
+        'worn_weight': 0,
+        'consumable_weight': 0,
+        'items_amount': 0,
+        'categories_amount': 0,
+        'categories': [],
+    }
+    if not isinstance(backpack_list, list):
+        return summary
+    for category in backpack_list:
+        if not isinstance(category, dict):
+            continue
+        items = category.get('items')
+        if not isinstance(items, list):
+            items = []
+        category_weight = 0
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            weight = to_number(item.get('weight')) * to_number(item.get('quantity', 1), 1)
+            category_weight += weight
+            if item.get('worn'):
+                summary['worn_weight'] += weight
+            elif item.get('consumable'):
+                summary['consumable_weight'] += weight
+            summary['items_amount'] += 1
+        summary['total_weight'] += category_weight
+        summary['categories_amount'] += 1
+        summary['categories'].append({'id': category.get('id'), 'name': category.get('name', ''),
+                                      'weight': round(category_weight, 2), 'items_amount': len(items)})
+    summary['base_weight'] = summary['total_weight'] - summary['worn_weight'] - summary['consumable_weight']
+    for key in ['total_weight', 'base_weight', 'worn_weight', 'consumable_weight']:
+        summary[key] = round(summary[key], 2)
+    return summary
@@ -0,0 +1,21 @@
+import time
+
+from django.core.cache import cache
+
+CATALOG_VERSION_KEY = 'catalog_version'
+
+
+def get_catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(CATALOG_VERSION_KEY, version, None):
+            version = cache.get(CATALOG_VERSION_KEY)  # other worker was first
+    return version
+
+
+def bump_catalog_version():
+    # catalog = categories, subcategories and brands sent to every client in InitialView
+    version = time.time_ns()
+    cache.set(CATALOG_VERSION_KEY, version, None)
+    return version
@@ -0,0 +1,33 @@
+from django.core.cache import cache
+
+from ..models import Category, Brand
+from ..serializers import CategorySerializer, BrandSerializer
+from .catalog import get_catalog_version
+
+CATALOG_CACHE_TIMEOUT = 60 * 60 * 24
+
+_worker_catalog = {'version': None, 'data': None}
+
+
+def build_catalog():
+    categories = Category.objects.prefetch_related('subcategories').order_by('id')
+    return {
+        'categories': CategorySerializer(categories, many=True).data,
+        'brands': BrandSerializer(Brand.objects.all().order_by('name'), many=True).data,
+    }
+
+
+def get_catalog(version=None):
+    # worker memory first, then shared cache, then database - all keyed by catalog version
+    if version is None:
+        version = get_catalog_version()
+    if _worker_catalog['version'] == version:
+        return _worker_catalog['data']
+    key = f'catalog:{version}'
+    data = cache.get(key)
+    if data is None:
+        data = build_catalog()
+        cache.set(key, data, CATALOG_CACHE_TIMEOUT)
+    _worker_catalog['version'] = version
+    _worker_catalog['data'] = data
+    return data
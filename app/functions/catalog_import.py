@@ -0,0 +1,197 @@
+import csv
+import time
+from pathlib import Path
+
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from simple_history.utils import bulk_create_with_history, bulk_update_with_history
+
+from ..models import Brand, Category, Subcategory, Product
+from .catalog import bump_catalog_version
+
+
+def cell_text(value):
+    return str(value).strip() if value is not None else ''
+
+
+def read_categories_sheet(sheet):
+    """every column is one category, first row is its name and the rest are names of subcategories"""
+    columns = {}
+    for row in sheet.iter_rows(values_only=True):
+        for index, value in enumerate(row):
+            columns.setdefault(index, []).append(cell_text(value))
+    for names in columns.values():
+        if names and names[0]:
+            yield names[0], [name for name in names[1:] if name]
+
+
+def read_product_rows(rows):
+    """product rows are: name, brand, subcategory, category (optional), url (optional)"""
+    for index, row in enumerate(rows):
+        row = [cell_text(value) for value in row] + [''] * (5 - len(row))
+        if index == 0 and row[0].lower() == 'name':
+            continue  # header
+        if row[0]:
+            yield row[:5]
+
+
+class CatalogFile:
+    """catalog workbook with 'brands', 'categories' and 'products' sheets, or csv file with product rows only"""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.workbook = None
+        self.csv_file = None
+
+    def __enter__(self):
+        if self.path.suffix.lower() == '.csv':
+            self.csv_file = open(self.path, newline='', encoding='utf-8-sig')
+        else:
+            self.workbook = load_workbook(self.path, read_only=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.csv_file:
+            self.csv_file.close()
+        if self.workbook:
+            self.workbook.close()
+
+    def sheet(self, name):
+        if self.workbook and name in self.workbook.sheetnames:
+            return self.workbook[name]
+        return None
+
+    def brands(self):
+        sheet = self.sheet('brands')
+        if sheet is None:
+            return
+        for row in sheet.iter_rows(max_col=1, values_only=True):
+            if row and cell_text(row[0]):
+                yield cell_text(row[0])
+
+    def categories(self):
+        sheet = self.sheet('categories')
+        if sheet is not None:
+            yield from read_categories_sheet(sheet)
+
+    def products(self):
+        if self.csv_file:
+            return read_product_rows(csv.reader(self.csv_file))
+        sheet = self.sheet('products') or self.workbook.active
+        return read_product_rows(sheet.iter_rows(max_col=5, values_only=True))
+
+
+def chunked(iterable, size):
+    chunk = []
+    for element in iterable:
+        chunk.append(element)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class CatalogImport:
+    """
+    upserts catalog from CatalogFile, nothing is deleted, brands and subcategories are resolved
+    through name -> id maps loaded once, products are written in chunks, every chunk in its own transaction
+    """
+
+    def __init__(self, author, chunk_size=1000):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.brands = dict(Brand.objects.values_list('name', 'id'))
+        self.categories = dict(Category.objects.values_list('name', 'id'))
+        self.subcategories = {}  # (category_id, name) -> id
+        self.subcategories_by_name = {}  # name -> [ids], for rows without category
+        for subcategory_id, category_id, name in Subcategory.objects.values_list('id', 'category_id', 'name'):
+            self.add_subcategory(subcategory_id, category_id, name)
+        self.stats = dict.fromkeys(['brands_created', 'categories_created', 'subcategories_created', 'product_rows',
+                                    'products_created', 'products_updated', 'rows_skipped'], 0)
+        self.timings = {}
+
+    def add_subcategory(self, subcategory_id, category_id, name):
+        self.subcategories[(category_id, name)] = subcategory_id
+        self.subcategories_by_name.setdefault(name, []).append(subcategory_id)
+
+    def import_brands(self, names):
+        new = {name for name in names if name not in self.brands}
+        for chunk in chunked(sorted(new), self.chunk_size):
+            created = bulk_create_with_history([Brand(name=name, author=self.author) for name in chunk], Brand)
+            self.brands.update((brand.name, brand.id) for brand in created)
+            self.stats['brands_created'] += len(created)
+
+    @transaction.atomic
+    def import_categories(self, categories):
+        categories = list(categories)
+        new = [Category(name=name) for name, subcategories in categories if name not in self.categories]
+        for category in Category.objects.bulk_create(new):
+            self.categories[category.name] = category.id
+        self.stats['categories_created'] += len(new)
+        new = [Subcategory(category_id=self.categories[category_name], name=name)
+               for category_name, names in categories for name in dict.fromkeys(names)
+               if (self.categories[category_name], name) not in self.subcategories]
+        for subcategory in Subcategory.objects.bulk_create(new):
+            self.add_subcategory(subcategory.id, subcategory.category_id, subcategory.name)
+        self.stats['subcategories_created'] += len(new)
+
+    def subcategory_id(self, name, category_name):
+        if category_name:
+            return self.subcategories.get((self.categories.get(category_name), name))
+        ids = self.subcategories_by_name.get(name, [])
+        return ids[0] if len(ids) == 1 else None  # missing or ambiguous without category
+
+    def import_products(self, rows):
+        for chunk in chunked(rows, self.chunk_size):
+            self.import_brands(brand for name, brand, subcategory, category, url in chunk if brand)
+            with transaction.atomic():
+                self.import_products_chunk(chunk)
+
+    def import_products_chunk(self, chunk):
+        self.stats['product_rows'] += len(chunk)
+        products = {}
+        for name, brand, subcategory, category, url in chunk:
+            subcategory_id = self.subcategory_id(subcategory, category)
+            if not brand or subcategory_id is None:
+                self.stats['rows_skipped'] += 1
+                continue
+            products[(self.brands[brand], subcategory_id, name)] = (brand, subcategory, url)
+
+        existing = {}
+        # full rows, history records of updated products need every field
+        for product in Product.objects.filter(name__in={key[2] for key in products}):
+            existing[(product.brand_id, product.subcategory_id, product.name)] = product
+
+        new, changed = [], []
+        now = timezone.now()
+        for (brand_id, subcategory_id, name), (brand, subcategory, url) in products.items():
+            product = existing.get((brand_id, subcategory_id, name))
+            search_name = Product.make_full_name(subcategory, brand, name)
+            if product is None:
+                new.append(Product(author=self.author, brand_id=brand_id, subcategory_id=subcategory_id, name=name,
+                                   url=url, search_name=search_name))
+            elif (url and product.url != url) or product.search_name != search_name:
+                product.url = url or product.url
+                product.search_name = search_name  # rows saved before search_name existed are repaired too
+                product.updated = now
+                changed.append(product)
+        if new:
+            bulk_create_with_history(new, Product)
+        if changed:
+            bulk_update_with_history(changed, Product, ['url', 'search_name', 'updated'])
+        self.stats['products_created'] += len(new)
+        self.stats['products_updated'] += len(changed)
+
+    def timed(self, phase, function, *args):
+        start = time.perf_counter()
+        function(*args)
+        self.timings[phase] = time.perf_counter() - start
+
+    def run(self, catalog_file):
+        self.timed('brands', self.import_brands, catalog_file.brands())
+        self.timed('categories', self.import_categories, catalog_file.categories())
+        self.timed('products', self.import_products, catalog_file.products())
+        bump_catalog_version()  # bulk operations do not send post_save signals
+        return self.stats
@@ -1,19 +1,88 @@
+import logging
+
 from django.urls import reverse
 from django.contrib.auth import login
 from django.conf import settings
 from django.utils.encoding import force_bytes
 from django.utils.encoding import force_text
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import get_connection
+from django.db import transaction
 from django.contrib.auth.tokens import default_token_generator
 from django.template.loader import render_to_string
 from django.shortcuts import redirect, HttpResponse
 from django.utils.encoding import DjangoUnicodeDecodeError
+from django.utils import timezone
 
-from app.models import MyUser
+from app.models import MyUser, QueuedEmail, HourlyStats
 from hikegear_backend.settings import FRONTEND_URL
 
 
+EMAIL_MAX_ATTEMPTS = 8
+EMAIL_RETRY_DELAY = 60  # seconds, doubled after every failed attempt
+
+logger = logging.getLogger(__name__)
+
+
+def queue_email(subject, text_content, html_content, from_email, recipients):
+    # emails are only written to database here, send_queued_emails command delivers them
+    return QueuedEmail.objects.create(subject=subject, body=text_content, html_body=html_content,
+                                      from_email=from_email, recipients=recipients)
+
+
+def schedule_retry(email, err):
+    email.attempts += 1
+    email.next_attempt = timezone.now() + timezone.timedelta(seconds=EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1))
+    email.last_error = repr(err)
+
+
+def send_queued_emails(batch_size=50):
+    """
+    sends all due emails in batches over one connection, returns amounts of sent and failed emails,
+    connection (smtp login) is opened only when there is at least one due email and reopened after failed send,
+    when it can not be opened due emails are retried later with backoff
+    """
+    sent = failed = 0
+    connection = get_connection()
+    opened = False
+    connection_error = None
+    try:
+        while connection_error is None:
+            with transaction.atomic():
+                emails = list(QueuedEmail.objects.select_for_update(skip_locked=True).filter(
+                    sent=None, attempts__lt=EMAIL_MAX_ATTEMPTS, next_attempt__lte=timezone.now()
+                ).order_by('next_attempt')[:batch_size])
+                if not emails:
+                    break
+                for email in emails:
+                    if not opened and connection_error is None:
+                        try:
+                            connection.open()
+                            opened = True
+                        except Exception as err:  # smtp server down or bad credentials
+                            logger.warning('can not open email connection: %r', err)
+                            connection_error = err
+                    if connection_error is not None:
+                        schedule_retry(email, connection_error)
+                        failed += 1
+                        continue
+                    try:
+                        email.to_message(connection).send()
+                    except Exception as err:  # smtp errors are not wrapped by django
+                        schedule_retry(email, err)
+                        failed += 1
+                        connection.close()  # socket may be dropped, next email opens a new connection
+                        opened = False
+                    else:
+                        email.sent = timezone.now()
+                        sent += 1
+                QueuedEmail.objects.bulk_update(emails, ['attempts', 'next_attempt', 'last_error', 'sent'])
+    finally:
+        if opened:
+            connection.close()
+    return sent, failed
+
+
 def send_account_activation_email(request, user):
     text_content = 'Aktywacja konta'
     subject = 'Aktywacja konta'
@@ -27,9 +96,7 @@ def send_account_activation_email(request, user):
     activation_url = reverse("activate_account", kwargs=kwargs)
     activate_url = f"{request.scheme}://{request.get_host()}{activation_url}"
     html_content = render_to_string(template_name, {'activate_url': activate_url})
-    email = EmailMultiAlternatives(subject, text_content, from_email, recipients)
-    email.attach_alternative(html_content, "text/html")
-    email.send()
+    queue_email(subject, text_content, html_content, from_email, recipients)
 
 
 def send_password_reset_email(user):
@@ -42,9 +109,7 @@ def send_password_reset_email(user):
     token = default_token_generator.make_token(user)
     reset_url = FRONTEND_URL + 'reset_hasla/' + uidb64 + '/' + token
     html_content = render_to_string(template_name, {'reset_url': reset_url})
-    email = EmailMultiAlternatives(subject, text_content, from_email, recipients)
-    email.attach_alternative(html_content, "text/html")
-    email.send()
+    queue_email(subject, text_content, html_content, from_email, recipients)
 
 
 def activate_user_account_view(request, uidb64=None, token=None):
@@ -56,6 +121,7 @@ def activate_user_account_view(request, uidb64=None, token=None):
     if default_token_generator.check_token(user, token):
         user.is_active = True
         user.save()
+        HourlyStats.increment('activations')
         login(request, user)
         return redirect(FRONTEND_URL + 'edytor')
     else:
@@ -0,0 +1,19 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import parse_etags, quote_etag
+
+
+def initial_view_etag(profile, catalog_version):
+    backpacks = profile.backpacks.aggregate(amount=Count('id'), last_updated=Max('updated'))
+    last_updated = backpacks['last_updated'].timestamp() if backpacks['last_updated'] else 0
+    token = f"{profile.pk}:{profile.updated.timestamp()}:{backpacks['amount']}:{last_updated}:{catalog_version}"
+    return quote_etag(hashlib.md5(token.encode()).hexdigest())
+
+
+def etag_matches(request, etag):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if not if_none_match:
+        return False
+    etags = [tag[2:] if tag.startswith('W/') else tag for tag in parse_etags(if_none_match)]
+    return etag in etags or '*' in etags
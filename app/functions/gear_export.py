@@ -0,0 +1,72 @@
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from rest_framework.exceptions import ValidationError
+
+EXPORT_EXTENSIONS = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def export_weight(weight):
+    if isinstance(weight, float) and weight.is_integer():
+        return int(weight)  # excel import reads only integer weights
+    return weight
+
+
+def gear_rows(gear_list, category_prefix=''):
+    """rows in the A:C layout read by excel import, every category starts with 'kategoria' row"""
+    for category in gear_list:
+        yield ['kategoria', category_prefix + (category.get('name') or ''), None]
+        for item in category.get('items', []):
+            yield [item.get('name', ''), item.get('description', ''), export_weight(item.get('weight', 0))]
+
+
+def backpacks_rows(backpacks):
+    for backpack in backpacks:
+        yield from gear_rows(backpack.list, f'{backpack.name} / ')
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def csv_response(rows, filename):
+    writer = csv.writer(Echo())
+    response = StreamingHttpResponse((writer.writerow(row) for row in rows), content_type=EXPORT_EXTENSIONS['csv'])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def xlsx_cell(sheet, value):
+    if isinstance(value, str) and value.startswith('='):
+        cell = WriteOnlyCell(sheet, value)
+        cell.data_type = 's'  # item names are text, not formulas
+        return cell
+    return value
+
+
+def xlsx_response(rows, filename):
+    # write-only workbook keeps rows in a temporary file, saved zip is streamed from disk
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append([xlsx_cell(sheet, value) for value in row])
+    xlsx_file = tempfile.TemporaryFile()
+    workbook.save(xlsx_file)
+    xlsx_file.seek(0)
+    return FileResponse(xlsx_file, as_attachment=True, filename=filename, content_type=EXPORT_EXTENSIONS['xlsx'])
+
+
+def export_response(request, rows, name):
+    extension = request.query_params.get('extension', 'xlsx')
+    if extension not in EXPORT_EXTENSIONS:
+        raise ValidationError({'extension': f"extension must be one of: {', '.join(EXPORT_EXTENSIONS)}"})
+    if extension == 'csv':
+        return csv_response(rows, f'{name}.csv')
+    return xlsx_response(rows, f'{name}.xlsx')
@@ -0,0 +1,42 @@
+class FreeIds:
+    """
+    allocates the lowest id that is not in used_ids and was not taken before,
+    ids are taken in increasing order so every id is checked once
+    """
+
+    def __init__(self, used_ids=(), limit=None):
+        self.used_ids = used_ids  # any container, e.g. id map of GearIds kept current by its user
+        self.taken_ids = set()
+        self.limit = limit
+        self.next_id = 0
+
+    def take(self):
+        while self.next_id in self.used_ids or self.next_id in self.taken_ids:
+            self.next_id += 1
+        if self.limit is not None and self.next_id >= self.limit:
+            return None
+        self.taken_ids.add(self.next_id)
+        return self.next_id
+
+
+class GearIds:
+    """
+    index of category and item ids of backpack list or private gear built in one pass, maps ids to categories
+    for operations on the list, every import into the list should take new ids from here
+    """
+
+    def __init__(self, gear_list=(), categories_limit=None, items_limit=None):
+        self.categories = {}  # category id -> category
+        self.item_categories = {}  # item id -> category containing the item
+        for category in gear_list:
+            self.categories[category['id']] = category
+            for item in category.get('items', []):
+                self.item_categories[item['id']] = category
+        self.free_category_ids = FreeIds(self.categories, categories_limit)
+        self.free_item_ids = FreeIds(self.item_categories, items_limit)
+
+    def new_category_id(self):
+        return self.free_category_ids.take()
+
+    def new_item_id(self):
+        return self.free_item_ids.take()
@@ -0,0 +1,91 @@
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ..models import Brand, Product, Review
+
+HISTORY_RETENTION_MODELS = [Brand, Product, Review]
+HISTORY_IDS_PER_CHUNK = 1000
+
+
+class HistoryPolicy:
+    def __init__(self, keep_last=10, daily_after_days=30, drop_after_days=None):
+        self.keep_last = keep_last
+        self.daily_after_days = daily_after_days
+        self.drop_after_days = drop_after_days
+
+    def __str__(self):
+        return f'keep last {self.keep_last}, daily after {self.daily_after_days} days, ' \
+               f'drop after {self.drop_after_days} days'
+
+
+def history_policies():
+    config = getattr(settings, 'HISTORY_RETENTION', {})
+    return {model: HistoryPolicy(**config.get(model.__name__, {})) for model in HISTORY_RETENTION_MODELS}
+
+
+def prune_sql(table, policy, now):
+    """
+    deletes historical records of objects with ids in [%s, %s) that policy does not keep,
+    returns amount of deleted rows and their size in bytes
+    """
+    conditions, params = [], []
+    if policy.drop_after_days is not None:
+        conditions.append('history_date < %s')
+        params.append(now - timezone.timedelta(days=policy.drop_after_days))
+    if policy.daily_after_days is not None:
+        conditions.append('(history_date < %s AND day_rank > 1)')
+        params.append(now - timezone.timedelta(days=policy.daily_after_days))
+    if not conditions:
+        return None, []
+    sql = f'''
+        WITH deleted AS (
+            DELETE FROM {table} WHERE history_id IN (
+                SELECT history_id FROM (
+                    SELECT history_id, history_date,
+                        row_number() OVER (PARTITION BY id ORDER BY history_date DESC, history_id DESC) AS version_rank,
+                        row_number() OVER (PARTITION BY id, history_date::date
+                                           ORDER BY history_date DESC, history_id DESC) AS day_rank
+                    FROM {table} WHERE id >= %s AND id < %s
+                ) AS ranked
+                WHERE version_rank > %s AND ({' OR '.join(conditions)})
+            )
+            RETURNING pg_column_size({table}.*) AS size
+        )
+        SELECT count(*), coalesce(sum(size), 0) FROM deleted'''
+    return sql, [policy.keep_last] + params
+
+
+def prune_history(history_model, policy, ids_per_chunk=HISTORY_IDS_PER_CHUNK, pause=0):
+    """
+    applies policy to historical records, every chunk of tracked object ids is pruned in its own transaction,
+    window functions only see rows of one chunk, returns (rows deleted, bytes of deleted rows, seconds)
+    """
+    start = time.perf_counter()
+    table = connection.ops.quote_name(history_model._meta.db_table)
+    sql, params = prune_sql(table, policy, timezone.now())
+    rows = size = 0
+    if sql is None:
+        return rows, size, 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT min(id), max(id) FROM {table}')
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        return rows, size, time.perf_counter() - start
+    for first_id in range(min_id, max_id + 1, ids_per_chunk):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [first_id, first_id + ids_per_chunk] + params)
+            chunk_rows, chunk_size = cursor.fetchone()
+        rows += chunk_rows
+        size += chunk_size
+        if pause:
+            time.sleep(pause)
+    return rows, size, time.perf_counter() - start
+
+
+def vacuum(history_model):
+    # makes space of deleted rows reusable and refreshes planner statistics, can not run in transaction
+    with connection.cursor() as cursor:
+        cursor.execute(f'VACUUM ANALYZE {connection.ops.quote_name(history_model._meta.db_table)}')
@@ -0,0 +1,20 @@
+from django.db.models import Sum
+from django.db.models.functions import TruncDay
+from django.utils import timezone
+
+from ..models import HourlyStats
+
+HOURLY_STATS_MAX_RANGE = timezone.timedelta(days=366)
+
+
+def read_hourly_stats(start, end, bucket='hour'):
+    """counters of hours in [start, end), grouped by hour or day, reads only rollup rows"""
+    rows = HourlyStats.objects.filter(hour__gte=HourlyStats.truncate(start), hour__lt=end)
+    if bucket == 'day':
+        rows = rows.annotate(time=TruncDay('hour')).values('time').annotate(
+            **{counter: Sum(counter) for counter in HourlyStats.COUNTERS}).order_by('time')
+    else:
+        rows = [{'time': row.pop('hour'), **row} for row in rows.values('hour', *HourlyStats.COUNTERS).order_by('hour')]
+    buckets = list(rows)
+    totals = {counter: sum(row[counter] for row in buckets) for counter in HourlyStats.COUNTERS}
+    return buckets, totals
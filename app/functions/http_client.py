@@ -0,0 +1,95 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    pass
+
+
+class CircuitBreaker:
+    """after failure_threshold failures in a row calls fail fast for reset_timeout seconds, then one call may try"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self):
+        with self.lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError('circuit open, remote server is failing')
+            self.opened_at = time.monotonic()  # half open, let this call through and block others
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class HttpClient:
+    """pooled keep-alive client with timeouts, exponential backoff with jitter and per host circuit breaker"""
+    retry_statuses = {502, 503, 504}
+
+    def __init__(self, timeout=(3.05, 10), retries=3, backoff=0.5, max_backoff=8, failure_threshold=5,
+                 reset_timeout=60, pool_size=10):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.breakers_lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def breaker(self, url):
+        host = urlsplit(url).netloc
+        with self.breakers_lock:
+            if host not in self.breakers:
+                self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[host]
+
+    def sleep_before_retry(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+        time.sleep(random.uniform(0, delay))  # full jitter
+
+    def get(self, url, **kwargs):
+        breaker = self.breaker(url)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            breaker.before_call()
+            try:
+                response = self.session.get(url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                breaker.failure()
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in self.retry_statuses:
+                    breaker.success()
+                    return response
+                breaker.failure()
+                if attempt == self.retries:
+                    return response
+            self.sleep_before_retry(attempt)
+
+
+lighterpack_client = HttpClient()
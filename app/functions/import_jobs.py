@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import time
+
+from django.db import transaction, close_old_connections
+from django.utils import timezone
+
+from ..models import ImportJob, HourlyStats
+from ..serializers import BackpackSerializer
+from .lpscraper import import_backpack_from_lp
+
+IMPORT_MAX_WORKERS = 4  # imports running at once in one worker process
+IMPORT_RUNNING_TIMEOUT = 600  # seconds, running jobs older than that are considered lost and queued again
+
+
+def claim_import_jobs(limit):
+    with transaction.atomic():
+        jobs = list(ImportJob.objects.select_for_update(skip_locked=True).filter(
+            status=ImportJob.QUEUED).order_by('created')[:limit])
+        ImportJob.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=ImportJob.RUNNING, updated=timezone.now())
+    return jobs
+
+
+def requeue_lost_import_jobs(running_ids=()):
+    """queues again jobs left running by a dead worker, running_ids are jobs this worker still runs"""
+    threshold = timezone.now() - timezone.timedelta(seconds=IMPORT_RUNNING_TIMEOUT)
+    return ImportJob.objects.filter(status=ImportJob.RUNNING, updated__lt=threshold).exclude(
+        id__in=running_ids).update(status=ImportJob.QUEUED, updated=timezone.now())
+
+
+def run_import_job(job):
+    try:
+        json_data = import_backpack_from_lp(job.url)
+        if not json_data:
+            job.status = ImportJob.FAILED
+            job.error = 'backpack not found'
+        else:
+            json_data['profile'] = job.profile_id
+            serializer = BackpackSerializer(data=json_data)
+            if serializer.is_valid():
+                job.backpack = serializer.save()
+                job.status = ImportJob.DONE
+                HourlyStats.increment(f'imports_{job.source}')
+            else:
+                job.status = ImportJob.FAILED
+                job.error = str(serializer.errors)
+    except Exception as err:  # a broken page must not kill the worker
+        job.status = ImportJob.FAILED
+        job.error = repr(err)
+    job.save(update_fields=['status', 'backpack', 'error', 'updated'])
+    return job
+
+
+def run_import_job_in_thread(job):
+    try:
+        return run_import_job(job)
+    finally:
+        close_old_connections()
+
+
+def mark_import_job_failed(job_id, future):
+    """done-callback, a job whose thread raised (e.g. its final save failed) must not stay running"""
+    err = future.exception()
+    if err is None:
+        return
+    ImportJob.objects.filter(id=job_id, status=ImportJob.RUNNING).update(
+        status=ImportJob.FAILED, error=repr(err), updated=timezone.now())
+
+
+def run_import_worker(max_workers=IMPORT_MAX_WORKERS, interval=1, once=False):
+    """claims queued jobs and runs at most max_workers of them at once"""
+    running = {}  # future: job id
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            running = {future: job_id for future, job_id in running.items() if not future.done()}
+            requeue_lost_import_jobs(list(running.values()))
+            free = max_workers - len(running)
+            jobs = claim_import_jobs(free) if free else []
+            for job in jobs:
+                future = executor.submit(run_import_job_in_thread, job)
+                future.add_done_callback(partial(mark_import_job_failed, job.id))
+                running[future] = job.id
+            if once and not jobs and not running:
+                return
+            time.sleep(interval if not jobs else 0)
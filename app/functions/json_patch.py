@@ -0,0 +1,114 @@
+import copy
+
+
+class JsonPatchError(Exception):
+    pass
+
+
+def json_equal(first, second):
+    """equality from RFC 6902 "test": types must match, so false is not 0 and 1 is not true"""
+    if isinstance(first, bool) or isinstance(second, bool):
+        return isinstance(first, bool) and isinstance(second, bool) and first == second
+    if isinstance(first, (int, float)) and isinstance(second, (int, float)):
+        return first == second
+    if isinstance(first, list) and isinstance(second, list):
+        return len(first) == len(second) and all(json_equal(a, b) for a, b in zip(first, second))
+    if isinstance(first, dict) and isinstance(second, dict):
+        return first.keys() == second.keys() and all(json_equal(first[key], second[key]) for key in first)
+    return type(first) is type(second) and first == second
+
+
+def parse_pointer(path):
+    if not isinstance(path, str):
+        raise JsonPatchError('path must be a string')
+    if path == '':
+        return []
+    if not path.startswith('/'):
+        raise JsonPatchError(f'invalid path "{path}"')
+    return [token.replace('~1', '/').replace('~0', '~') for token in path[1:].split('/')]
+
+
+def list_index(container, token, allow_end=False):
+    if token == '-' and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token[0] == '0'):
+        raise JsonPatchError(f'invalid list index "{token}"')
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise JsonPatchError(f'list index "{token}" out of range')
+    return index
+
+
+def resolve(document, tokens):
+    for token in tokens:
+        if isinstance(document, list):
+            document = document[list_index(document, token)]
+        elif isinstance(document, dict) and token in document:
+            document = document[token]
+        else:
+            raise JsonPatchError(f'path member "{token}" does not exist')
+    return document
+
+
+def add(document, tokens, value):
+    if not tokens:
+        return value
+    parent = resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, list):
+        parent.insert(list_index(parent, key, allow_end=True), value)
+    elif isinstance(parent, dict):
+        parent[key] = value
+    else:
+        raise JsonPatchError(f'can not add member "{key}" to a scalar value')
+    return document
+
+
+def remove(document, tokens):
+    if not tokens:
+        raise JsonPatchError('can not remove whole document')
+    parent = resolve(document, tokens[:-1])
+    key = tokens[-1]
+    if isinstance(parent, list):
+        return parent.pop(list_index(parent, key))
+    if isinstance(parent, dict) and key in parent:
+        return parent.pop(key)
+    raise JsonPatchError(f'path member "{key}" does not exist')
+
+
+def apply_patch(document, operations):
+    """applies RFC 6902 operations to a copy of document and returns it, original document is left untouched"""
+    if not isinstance(operations, list):
+        raise JsonPatchError('patch must be a list of operations')
+    document = copy.deepcopy(document)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise JsonPatchError('operation must be an object')
+        op = operation.get('op')
+        tokens = parse_pointer(operation.get('path'))
+        if op in ('add', 'replace', 'test') and 'value' not in operation:
+            raise JsonPatchError(f'"{op}" operation requires "value"')
+        if op == 'add':
+            document = add(document, tokens, operation['value'])
+        elif op == 'remove':
+            remove(document, tokens)
+        elif op == 'replace':
+            resolve(document, tokens)
+            if tokens:
+                remove(document, tokens)
+            document = add(document, tokens, operation['value'])
+        elif op in ('move', 'copy'):
+            from_tokens = parse_pointer(operation.get('from'))
+            if op == 'move':
+                if tokens[:len(from_tokens)] == from_tokens and len(tokens) > len(from_tokens):
+                    raise JsonPatchError('can not move value into one of its children')
+                value = remove(document, from_tokens)
+            else:
+                value = copy.deepcopy(resolve(document, from_tokens))
+            document = add(document, tokens, value)
+        elif op == 'test':
+            if not json_equal(resolve(document, tokens), operation['value']):
+                raise JsonPatchError(f'test operation failed for path "{operation["path"]}"')
+        else:
+            raise JsonPatchError(f'unknown operation "{op}"')
+    return document
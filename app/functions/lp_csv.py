@@ -0,0 +1,75 @@
+import codecs
+import csv
+from pathlib import PurePath
+
+from rest_framework.exceptions import ValidationError
+
+from .gear_ids import GearIds
+from .lpscraper import convert_lp_item
+from .. import constants
+
+LP_CSV_COLUMNS = ['item name', 'category', 'desc', 'qty', 'weight', 'unit']
+LP_CSV_UNITS = {'gram': 'g', 'kilogram': 'kg', 'ounce': 'oz', 'pound': 'lb', 'g': 'g', 'kg': 'kg', 'oz': 'oz',
+                'lb': 'lb'}
+LP_CSV_MAX_ITEMS = 2000
+
+
+def is_checked(value):
+    return value.strip().lower() not in ('', '0', 'false', 'no')
+
+
+def import_backpack_from_lp_csv(csv_file, name=None):
+    """
+    reads lighterpack csv export row by row, columns:
+    Item Name, Category, desc, qty, weight, unit, url, price, worn, consumable
+    returns the same structure as import_backpack_from_lp
+    """
+    rows = csv.reader(codecs.iterdecode(csv_file, 'utf-8-sig'))
+    try:
+        header = [column.strip().lower() for column in next(rows)]
+        columns = {column: header.index(column) for column in LP_CSV_COLUMNS}
+    except StopIteration:
+        raise ValidationError({'csv': 'empty file'})
+    except ValueError:
+        raise ValidationError({'csv': 'bad format, this is not lighterpack csv export'})
+    except UnicodeDecodeError:
+        raise ValidationError({'csv': 'bad format, file must be utf-8 encoded csv'})
+    worn_column = header.index('worn') if 'worn' in header else None
+    consumable_column = header.index('consumable') if 'consumable' in header else None
+
+    if name is None:
+        name = PurePath(getattr(csv_file, 'name', '') or '').stem
+    ready_to_json = {'name': name[:constants.backpack_max_name_length], 'description': '', 'list': []}
+    ids = GearIds()
+    categories = {}
+    items_amount = 0
+    try:
+        for row in rows:
+            if not any(row):
+                continue
+            if len(row) < len(header):
+                row += [''] * (len(header) - len(row))
+            category_name = row[columns['category']]
+            if category_name not in categories:
+                categories[category_name] = {'id': ids.new_category_id(), 'name': category_name, 'items': []}
+                ready_to_json['list'].append(categories[category_name])
+            item = {
+                'name': row[columns['item name']].strip(),
+                'description': row[columns['desc']].strip(),
+                'worn': worn_column is not None and is_checked(row[worn_column]),
+                'consumable': consumable_column is not None and is_checked(row[consumable_column]),
+                'weight': row[columns['weight']].strip(),
+                'unit': LP_CSV_UNITS.get(row[columns['unit']].strip().lower(), 'g'),
+                'quantity': row[columns['qty']].strip() or '1',
+            }
+            categories[category_name]['items'].append(convert_lp_item(item, ids.new_item_id()))
+            items_amount += 1
+            if items_amount > LP_CSV_MAX_ITEMS:
+                raise ValidationError({'csv': 'too many items'})
+    except ValueError:
+        raise ValidationError({'csv': f'invalid weight or quantity in row {items_amount + 2}'})
+    except (UnicodeDecodeError, csv.Error):
+        raise ValidationError({'csv': 'bad format, file must be utf-8 encoded csv'})
+    if not items_amount:
+        raise ValidationError({'csv': 'no items provided'})
+    return ready_to_json
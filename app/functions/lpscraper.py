@@ -1,50 +1,173 @@
-import requests
-from bs4 import BeautifulSoup
-from requests.exceptions import ConnectionError
+import copy
+from html.parser import HTMLParser
+
+from requests.exceptions import RequestException
+
+from .gear_ids import GearIds
+from .http_client import lighterpack_client
+from .page_cache import PageCache
+
+
+lighterpack_pages = PageCache()
 
 
 def scrape_backpack(url):
-    results_data = {}
-    error_counter = 0
-
-    while error_counter < 10:  # sometimes lighterpack.com do not respond correctly, it tries 10 times
-        try:
-            page = requests.get(url)
-        except ConnectionError:
-            error_counter += 1
-            continue
-        break
-    else:
+    # returned data is modified by import_backpack_from_lp, so cached data is always copied
+    cached = lighterpack_pages.get(url)
+    if cached is not None and cached.is_fresh(lighterpack_pages.ttl):
+        return copy.deepcopy(cached.data)
+
+    try:  # sometimes lighterpack.com do not respond correctly, client retries with backoff
+        page = lighterpack_client.get(url, headers=cached.validators() if cached else {})
+    except RequestException:
         return False
 
+    if page.status_code == 304 and cached is not None:
+        lighterpack_pages.touch(url)
+        return copy.deepcopy(cached.data)
     if page.status_code == 400:
         return False
 
-    soup = BeautifulSoup(page.text, 'html.parser')
-    results_data['name'] = soup.find('h1', class_='lpListName').text
-
-    description = soup.find(id='lpListDescription')
-    if description:
-        results_data['description'] = description.find('p').text
-    else:
-        results_data['description'] = ''
-
-    results_data['categories'] = []
-    categories = soup.find_all('li', class_='lpCategory')
-    for category in categories:
-        cat_data = {'name': category.find('h2', class_='lpCategoryName').text, 'items': []}
-        items = category.find_all('li', class_='lpItem')
-        for item in items:
-            item_data = {
-                'name': item.find('span', class_='lpName').text.strip(),
-                'description': item.find('span', class_='lpDescription').text.strip(),
-                'worn': bool(item.find('i', class_='lpSprite lpWorn lpActive')),
-                'consumable': bool(item.find('i', class_='lpSprite lpConsumable lpActive')),
-                'weight': item.find('span', class_='lpWeight').text,
-                'unit': item.find('div', class_='lpUnitSelect').find('span', class_='lpDisplay').text,
-                'quantity': item.find('span', class_='lpQtyCell').text.strip()
-            }
-            cat_data['items'].append(item_data)
+    results_data = parse_backpack_page(page.text)
+    if page.status_code == 200:
+        lighterpack_pages.set(url, results_data, page.headers.get('ETag'), page.headers.get('Last-Modified'))
+    return copy.deepcopy(results_data)
+
+
+ITEM_SPANS = {'lpName': 'name', 'lpDescription': 'description', 'lpWeight': 'weight', 'lpQtyCell': 'quantity'}
+
+
+class TextCapture:
+    def __init__(self, tag, on_done):
+        self.tag = tag
+        self.depth = 1
+        self.parts = []
+        self.on_done = on_done
+
+
+class LighterpackPageParser(HTMLParser):
+    """
+    streaming parser of lighterpack list page, it does not build any tree, only collects text of list name,
+    description and lpCategory/lpItem nodes, results are the same as from BeautifulSoup find/find_all
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.name = None
+        self.description = None
+        self.description_depth = 0
+        self.description_found = False
+        self.categories = []
+        self.li_stack = []
+        self.category = None
+        self.item = None
+        self.unit_select_depth = 0
+        self.captures = []
+
+    def capture(self, tag, on_done):
+        self.captures.append(TextCapture(tag, on_done))
+
+    def handle_starttag(self, tag, attrs):
+        for capture in self.captures:
+            if capture.tag == tag:
+                capture.depth += 1
+        attrs = dict(attrs)
+        classes = (attrs.get('class') or '').split()
+
+        if tag == 'li':
+            kind = 'category' if 'lpCategory' in classes else 'item' if 'lpItem' in classes else None
+            self.li_stack.append(kind)
+            if kind == 'category':
+                self.category = {'name': None, 'items': []}
+                self.categories.append(self.category)
+            elif kind == 'item' and self.category is not None:
+                self.item = {'worn': False, 'consumable': False}
+                self.category['items'].append(self.item)
+        elif self.item is not None:
+            self.handle_item_starttag(tag, classes)
+        elif tag == 'h2' and self.category is not None and self.category['name'] is None \
+                and 'lpCategoryName' in classes:
+            category = self.category
+            self.capture(tag, lambda text: category.__setitem__('name', text))
+        elif tag == 'h1' and self.name is None and 'lpListName' in classes:
+            self.capture(tag, lambda text: setattr(self, 'name', text))
+
+        if self.description_depth:
+            if tag == 'div':
+                self.description_depth += 1
+            elif tag == 'p' and not self.description_found:
+                self.description_found = True
+                self.capture(tag, lambda text: setattr(self, 'description', text))
+        elif tag == 'div' and attrs.get('id') == 'lpListDescription' and self.description is None:
+            self.description = ''
+            self.description_depth = 1
+
+    def handle_item_starttag(self, tag, classes):
+        item = self.item
+        if tag == 'span':
+            for cls in classes:
+                field = ITEM_SPANS.get(cls)
+                if field and field not in item:
+                    item[field] = None
+                    self.capture(tag, lambda text, field=field: item.__setitem__(field, text))
+            if self.unit_select_depth and 'unit' not in item and 'lpDisplay' in classes:
+                item['unit'] = None
+                self.capture(tag, lambda text: item.__setitem__('unit', text))
+        elif tag == 'div':
+            if self.unit_select_depth:
+                self.unit_select_depth += 1
+            elif 'lpUnitSelect' in classes and 'unit' not in item:
+                self.unit_select_depth = 1
+        elif tag == 'i':
+            joined_classes = ' '.join(classes)
+            item['worn'] = item['worn'] or joined_classes == 'lpSprite lpWorn lpActive'
+            item['consumable'] = item['consumable'] or joined_classes == 'lpSprite lpConsumable lpActive'
+
+    def handle_endtag(self, tag):
+        for capture in list(self.captures):
+            if capture.tag == tag:
+                capture.depth -= 1
+                if capture.depth == 0:
+                    self.captures.remove(capture)
+                    capture.on_done(''.join(capture.parts))
+        if tag == 'div':
+            if self.unit_select_depth:
+                self.unit_select_depth -= 1
+            if self.description_depth:
+                self.description_depth -= 1
+        elif tag == 'li' and self.li_stack:
+            kind = self.li_stack.pop()
+            if kind == 'item':
+                self.item = None
+                self.unit_select_depth = 0
+            elif kind == 'category':
+                self.category = None
+
+    def handle_data(self, data):
+        for capture in self.captures:
+            capture.parts.append(data)
+
+
+def parse_backpack_page(html):
+    parser = LighterpackPageParser()
+    parser.feed(html)
+    parser.close()
+    if parser.name is None:
+        raise ValueError('not a lighterpack list page')
+
+    results_data = {'name': parser.name, 'description': parser.description or '', 'categories': []}
+    for category in parser.categories:
+        cat_data = {'name': category['name'], 'items': []}
+        for item in category['items']:
+            cat_data['items'].append({
+                'name': item['name'].strip(),
+                'description': item['description'].strip(),
+                'worn': item['worn'],
+                'consumable': item['consumable'],
+                'weight': item['weight'],
+                'unit': item['unit'],
+                'quantity': item['quantity'].strip()
+            })
         results_data['categories'].append(cat_data)
     return results_data
 
@@ -53,43 +176,40 @@ def import_backpack_from_lp(url):
     scrape_data = scrape_backpack(url)
     if not scrape_data:
         return False
+    return convert_lp_backpack(scrape_data)
+
 
+LP_UNITS_IN_GRAMS = {'g': 1, 'kg': 1000, 'oz': 28.35, 'lb': 453.59}
+
+
+def convert_lp_item(item, item_id):
+    weight = float(item['weight']) if item['weight'] != '' else 0.0
+    return {
+        'id': item_id,
+        'name': item['name'],
+        'description': item['description'],
+        'weight': weight * LP_UNITS_IN_GRAMS.get(item['unit'], 1),
+        'worn': item['worn'],
+        'consumable': item['consumable'],
+        'quantity': float(item['quantity']),
+    }
+
+
+def convert_lp_backpack(scrape_data):
     ready_to_json = {
         'name': scrape_data['name'],
         'description': scrape_data['description'],
         'list': []
     }
 
-    items_id_counter = 0
-    for category_id, category in enumerate(scrape_data['categories']):
+    ids = GearIds()
+    for category in scrape_data['categories']:
         ready_to_json['list'].append({
-            'id': category_id,
+            'id': ids.new_category_id(),
             'name': category['name'],
             'items': []
         })
 
         for item in category['items']:
-            if item['weight'] == '':
-                item['weight'] = 0
-
-            item['weight'] = float(item['weight'])
-            if item['unit'] == 'g':
-                pass
-            elif item['unit'] == 'kg':
-                item['weight'] = item['weight'] * 1000
-            elif item['unit'] == 'oz':
-                item['weight'] = item['weight'] * 28.35
-            elif item['unit'] == 'lb':
-                item['weight'] = item['weight'] * 453.59
-
-            ready_to_json['list'][-1]['items'].append({
-                'id': items_id_counter,
-                'name': item['name'],
-                'description': item['description'],
-                'weight': item['weight'],
-                'worn': item['worn'],
-                'consumable': item['consumable'],
-                'quantity': float(item['quantity']),
-            })
-            items_id_counter += 1
+            ready_to_json['list'][-1]['items'].append(convert_lp_item(item, ids.new_item_id()))
     return ready_to_json
@@ -0,0 +1,90 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import MyUser, Backpack, Product
+from .backpack_summary import summarize_backpack_list
+from hikegear_backend.settings import PASSWORD_RESET_TIMEOUT
+
+PRUNE_CHUNK_SIZE = 1000
+BACKFILL_CHUNK_SIZE = 500
+
+
+def delete_in_chunks(queryset, chunk_size=PRUNE_CHUNK_SIZE, pause=0):
+    """
+    deletes rows of queryset by primary keys, at most chunk_size rows in one short transaction,
+    returns (rows deleted from queryset table, seconds)
+    """
+    start = time.perf_counter()
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+            if pks:
+                queryset.model.objects.filter(pk__in=pks).delete()
+        deleted += len(pks)
+        if len(pks) < chunk_size:
+            return deleted, time.perf_counter() - start
+        if pause:
+            time.sleep(pause)
+
+
+def expired_sessions():
+    return Session.objects.filter(expire_date__lt=timezone.now())
+
+
+def stale_inactive_users():
+    # activation link of these users has already expired, so they can never activate their accounts
+    threshold = timezone.now() - timezone.timedelta(seconds=PASSWORD_RESET_TIMEOUT)
+    return MyUser.objects.filter(is_active=False, is_staff=False, is_superuser=False, date_joined__lt=threshold)
+
+
+def update_in_chunks(queryset, fields, refresh, chunk_size=BACKFILL_CHUNK_SIZE, pause=0):
+    """
+    walks queryset in primary key order, refresh(row) sets fields and returns True if anything changed,
+    changed rows of every chunk are saved with one bulk_update, returns (rows checked, rows updated, seconds)
+    """
+    start = time.perf_counter()
+    checked = updated = 0
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = list(chunk[:chunk_size])
+        changed = [row for row in rows if refresh(row)]
+        if changed:
+            queryset.model.objects.bulk_update(changed, fields)
+        checked += len(rows)
+        updated += len(changed)
+        if len(rows) < chunk_size:
+            return checked, updated, time.perf_counter() - start
+        last_pk = rows[-1].pk
+        if pause:
+            time.sleep(pause)
+
+
+def refresh_backpack_summary(backpack):
+    summary = summarize_backpack_list(backpack.list)
+    if backpack.summary == summary:
+        return False
+    backpack.summary = summary
+    return True
+
+
+def refresh_search_name(product):
+    if product.search_name == product.full_name:
+        return False
+    product.search_name = product.full_name
+    return True
+
+
+def backfills():
+    """(name, queryset, fields, refresh) of denormalized fields that are kept current only by save()"""
+    return [
+        ('backpack summaries', Backpack.objects.only('id', 'list', 'summary'), ['summary'], refresh_backpack_summary),
+        ('product search names', Product.objects.select_related('brand', 'subcategory').only(
+            'id', 'name', 'search_name', 'brand__name', 'subcategory__name'), ['search_name'], refresh_search_name),
+    ]
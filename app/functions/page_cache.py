@@ -0,0 +1,64 @@
+from collections import OrderedDict
+import threading
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+
+class CachedPage:
+    def __init__(self, data, etag=None, last_modified=None):
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = time.monotonic()
+
+    def is_fresh(self, ttl):
+        return time.monotonic() - self.fetched_at < ttl
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class PageCache:
+    """in process LRU cache of parsed pages, fresh for ttl seconds, after that revalidated with ETag/Last-Modified"""
+
+    def __init__(self, max_entries=256, ttl=600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def normalize_url(url):
+        parts = urlsplit(url.strip())
+        path = parts.path.rstrip('/') or '/'
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ''))
+
+    def get(self, url):
+        key = self.normalize_url(url)
+        with self.lock:
+            page = self.entries.get(key)
+            if page is not None:
+                self.entries.move_to_end(key)
+            return page
+
+    def set(self, url, data, etag=None, last_modified=None):
+        key = self.normalize_url(url)
+        with self.lock:
+            self.entries[key] = CachedPage(data, etag, last_modified)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def touch(self, url):
+        page = self.get(url)
+        if page is not None:
+            page.fetched_at = time.monotonic()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
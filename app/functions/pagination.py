@@ -0,0 +1,57 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValidationError({'cursor': 'invalid cursor'})
+    if not isinstance(values, list):
+        raise ValidationError({'cursor': 'invalid cursor'})
+    return values
+
+
+def get_page_size(request, default, maximum):
+    page_size = request.query_params.get('page_size')
+    if page_size is None:
+        return default
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise ValidationError({'page_size': 'page_size must be an integer'})
+    if page_size < 1:
+        raise ValidationError({'page_size': 'page_size must be positive'})
+    return min(page_size, maximum)
+
+
+def keyset_page(queryset, page_size, cursor_values):
+    """queryset must be already filtered by cursor and ordered, fetches one extra row to know if there is more"""
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    next_cursor = encode_cursor(cursor_values(rows[-1])) if has_more else None
+    return rows, has_more, next_cursor
+
+
+def newest_first_page(queryset, page_size, cursor=None):
+    """keyset page of rows with 'created' field, ordered from the newest, cursor is [created, id] of last row"""
+    queryset = queryset.order_by('-created', '-id')
+    if cursor:
+        try:
+            created, last_id = decode_cursor(cursor)
+            created = parse_datetime(created)
+        except (ValueError, TypeError):
+            raise ValidationError({'cursor': 'invalid cursor'})
+        if created is None or not isinstance(last_id, int):
+            raise ValidationError({'cursor': 'invalid cursor'})
+        queryset = queryset.filter(Q(created__lt=created) | Q(created=created, id__lt=last_id))
+    return keyset_page(queryset, page_size, lambda row: [row.created.isoformat(), row.id])
@@ -0,0 +1,111 @@
+from rest_framework.exceptions import ValidationError
+
+from ..serializers import GearItemSerializer, GearCategorySerializer, GearOperationSerializer
+from .gear_ids import GearIds
+
+
+def find_category(ids, category_id):
+    try:
+        return ids.categories[category_id]
+    except KeyError:
+        raise ValidationError({'operations': f'category {category_id} does not exist'})
+
+
+def find_item(ids, item_id):
+    try:
+        category = ids.item_categories[item_id]
+    except KeyError:
+        raise ValidationError({'operations': f'item {item_id} does not exist'})
+    for index, item in enumerate(category['items']):
+        if item['id'] == item_id:
+            return category, index
+    raise ValidationError({'operations': f'item {item_id} does not exist'})
+
+
+def validated(serializer_class, data, partial=False):
+    serializer = serializer_class(data=data, partial=partial)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def insert(container, position, value):
+    if position is None:
+        container.append(value)
+    else:
+        container.insert(position, value)
+
+
+def apply_gear_operations(private_gear, operations):
+    """
+    modifies private_gear in place, supported operations:
+    {'op': 'add', 'category': {...}, 'position': 0}
+    {'op': 'add', 'category_id': 0, 'item': {...}, 'position': 0}
+    {'op': 'update', 'category_id': 0, 'value': {'name': ...}}
+    {'op': 'update', 'item_id': 0, 'value': {...}}
+    {'op': 'move', 'category_id': 0, 'position': 0}
+    {'op': 'move', 'item_id': 0, 'category_id': 0, 'position': 0}
+    {'op': 'delete', 'category_id': 0} or {'op': 'delete', 'item_id': 0}
+    position is optional everywhere, without it element goes to the end,
+    only fields validated by gear serializers are stored
+    """
+    if not isinstance(operations, list):
+        raise ValidationError({'operations': 'operations must be a list'})
+    ids = GearIds(private_gear)
+    for operation in operations:
+        if not isinstance(operation, dict):
+            raise ValidationError({'operations': 'operation must be an object'})
+        operation = validated(GearOperationSerializer, operation)
+        op = operation['op']
+        position = operation.get('position')
+
+        if op == 'add' and 'category' in operation:
+            category = dict(operation['category'])
+            category['items'] = [dict(item) for item in category.get('items', [])]
+            if category['id'] in ids.categories:
+                raise ValidationError({'operations': f'category {category["id"]} already exists'})
+            for item in category['items']:
+                if item['id'] in ids.item_categories:
+                    raise ValidationError({'operations': f'item {item["id"]} already exists'})
+                ids.item_categories[item['id']] = category
+            insert(private_gear, position, category)
+            ids.categories[category['id']] = category
+        elif op == 'add' and 'item' in operation:
+            category = find_category(ids, operation.get('category_id'))
+            item = dict(operation['item'])
+            if item['id'] in ids.item_categories:
+                raise ValidationError({'operations': f'item {item["id"]} already exists'})
+            insert(category.setdefault('items', []), position, item)
+            ids.item_categories[item['id']] = category
+        elif op == 'update' and 'item_id' in operation:
+            category, item_index = find_item(ids, operation['item_id'])
+            value = validated(GearItemSerializer, operation.get('value', {}), partial=True)
+            value.pop('id', None)
+            category['items'][item_index].update(value)
+        elif op == 'update' and 'category_id' in operation:
+            category = find_category(ids, operation['category_id'])
+            value = validated(GearCategorySerializer, operation.get('value', {}), partial=True)
+            if 'name' in value:
+                category['name'] = value['name']
+        elif op == 'move' and 'item_id' in operation:
+            category, item_index = find_item(ids, operation['item_id'])
+            target = find_category(ids, operation.get('category_id', category['id']))
+            item = category['items'].pop(item_index)
+            insert(target.setdefault('items', []), position, item)
+            ids.item_categories[item['id']] = target
+        elif op == 'move' and 'category_id' in operation:
+            category = find_category(ids, operation['category_id'])
+            private_gear.remove(category)
+            insert(private_gear, position, category)
+        elif op == 'delete' and 'item_id' in operation:
+            category, item_index = find_item(ids, operation['item_id'])
+            del category['items'][item_index]
+            del ids.item_categories[operation['item_id']]
+        elif op == 'delete' and 'category_id' in operation:
+            category = find_category(ids, operation['category_id'])
+            private_gear.remove(category)
+            del ids.categories[category['id']]
+            for item in category.get('items', []):
+                ids.item_categories.pop(item['id'], None)
+        else:
+            raise ValidationError({'operations': f"operation {op} needs category, item, category_id or item_id"})
+    return private_gear
@@ -0,0 +1,35 @@
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from ..models import MyUser, Backpack
+
+STATS_CACHE_KEY = 'stats'
+STATS_CACHE_TIMEOUT = 30
+STATS_PERIODS = {
+    'last24h': timezone.timedelta(hours=24),
+    'last1h': timezone.timedelta(hours=1),
+    'last10min': timezone.timedelta(minutes=10),
+}
+
+
+def count_created(queryset, field, now):
+    # one conditional aggregation query instead of a query per period
+    periods = {name: Count('pk', filter=Q(**{f'{field}__gt': now - delta})) for name, delta in STATS_PERIODS.items()}
+    return queryset.aggregate(all=Count('pk'), **periods)
+
+
+def build_stats():
+    now = timezone.now()
+    return {
+        'users': count_created(MyUser.objects.all(), 'date_joined', now),
+        'backpacks': count_created(Backpack.objects.all(), 'created', now),
+    }
+
+
+def get_stats():
+    stats = cache.get(STATS_CACHE_KEY)
+    if stats is None:
+        stats = build_stats()
+        cache.set(STATS_CACHE_KEY, stats, STATS_CACHE_TIMEOUT)
+    return stats
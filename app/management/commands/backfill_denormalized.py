@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.functions.maintenance import update_in_chunks, backfills, BACKFILL_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Recomputes denormalized fields of rows saved before the fields existed, in chunks, can be run repeatedly'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=BACKFILL_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        for name, queryset, fields, refresh in backfills():
+            checked, updated, seconds = update_in_chunks(queryset, fields, refresh, options['chunk_size'],
+                                                         options['pause'])
+            self.stdout.write(f'{name}: {updated} of {checked} updated in {seconds:.2f}s')
@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.models import MyUser
+from app.functions.catalog_import import CatalogFile, CatalogImport
+
+
+class Command(BaseCommand):
+    help = "Upserts brands, categories, subcategories and products from catalog .xlsx ('brands', 'categories' " \
+           "and 'products' sheets) or .csv (product rows: name, brand, subcategory, category, url)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--author', help='email of user set as author of new brands and products, '
+                                             'first superuser by default')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = MyUser.objects.filter(email=options['author']) if options['author'] else \
+            MyUser.objects.filter(is_superuser=True).order_by('id')
+        author = users.select_related('profile').first()
+        if author is None:
+            raise CommandError('author of catalog not found')
+
+        start = time.perf_counter()
+        catalog_import = CatalogImport(author.profile, options['chunk_size'])
+        try:
+            with CatalogFile(options['path']) as catalog_file:
+                stats = catalog_import.run(catalog_file)
+        except (OSError, KeyError) as err:
+            raise CommandError(f'can not read catalog file: {err}')
+        seconds = time.perf_counter() - start
+
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
+        for phase, phase_seconds in catalog_import.timings.items():
+            self.stdout.write(f'{phase} time: {phase_seconds:.2f}s')
+        self.stdout.write(f'total time: {seconds:.2f}s')
+        rows_per_second = stats['product_rows'] / seconds
+        self.stdout.write(self.style.SUCCESS(f'imported catalog, {rows_per_second:.0f} product rows/s'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.functions.history_retention import history_policies, prune_history, vacuum, HISTORY_IDS_PER_CHUNK
+
+
+class Command(BaseCommand):
+    help = 'Prunes simple_history tables of Brand, Product and Review by HISTORY_RETENTION policies from settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', action='append', help='prune only history of this model, can be repeated')
+        parser.add_argument('--ids-per-chunk', type=int, default=HISTORY_IDS_PER_CHUNK,
+                            help='tracked objects pruned in one transaction')
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+        parser.add_argument('--vacuum', action='store_true', help='run VACUUM ANALYZE on pruned tables')
+
+    def handle(self, *args, **options):
+        policies = history_policies()
+        if options['model']:
+            unknown = set(options['model']) - {model.__name__ for model in policies}
+            if unknown:
+                raise CommandError(f"unknown models: {', '.join(sorted(unknown))}")
+            policies = {model: policy for model, policy in policies.items() if model.__name__ in options['model']}
+
+        total_rows = total_size = 0
+        for model, policy in policies.items():
+            history_model = model.history.model
+            rows, size, seconds = prune_history(history_model, policy, options['ids_per_chunk'], options['pause'])
+            if options['vacuum']:
+                vacuum(history_model)
+            total_rows += rows
+            total_size += size
+            self.stdout.write(f'{model.__name__} ({policy}): {rows} rows, {size / 1024:.1f} KiB '
+                              f'reclaimed in {seconds:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'reclaimed {total_rows} rows, {total_size / 1024:.1f} KiB'))
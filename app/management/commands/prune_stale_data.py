@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from app.functions.maintenance import delete_in_chunks, expired_sessions, stale_inactive_users, PRUNE_CHUNK_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired sessions and never activated accounts with expired activation links, in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=PRUNE_CHUNK_SIZE)
+        parser.add_argument('--pause', type=float, default=0, help='seconds to sleep between chunks')
+
+    def handle(self, *args, **options):
+        for name, queryset in [('expired sessions', expired_sessions()),
+                               ('stale inactive users', stale_inactive_users())]:
+            deleted, seconds = delete_in_chunks(queryset, options['chunk_size'], options['pause'])
+            rows_per_second = deleted / seconds if seconds else 0
+            self.stdout.write(f'{name}: {deleted} deleted in {seconds:.2f}s ({rows_per_second:.0f} rows/s)')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from app.functions.import_jobs import run_import_worker, IMPORT_MAX_WORKERS
+
+
+class Command(BaseCommand):
+    help = 'Runs queued backpack imports (lighterpack.com) with a bounded worker pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-workers', type=int, default=IMPORT_MAX_WORKERS)
+        parser.add_argument('--interval', type=float, default=1, help='seconds between checks for new jobs')
+        parser.add_argument('--once', action='store_true', help='exit when there are no more queued jobs')
+
+    def handle(self, *args, **options):
+        run_import_worker(options['max_workers'], options['interval'], options['once'])
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from app.functions.emails import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Sends queued emails (activation, password reset) over one reused connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help='keep running and check for new emails')
+        parser.add_argument('--interval', type=float, default=5, help='seconds between checks with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            start = time.perf_counter()
+            try:
+                sent, failed = send_queued_emails(options['batch_size'])
+            except Exception as err:  # e.g. database restart, --loop must keep running
+                if not options['loop']:
+                    raise
+                self.stderr.write(f'sending failed: {err!r}')
+            else:
+                if sent or failed:
+                    self.stdout.write(f'sent: {sent}, failed: {failed}, time: {time.perf_counter() - start:.2f}s')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -1,13 +1,19 @@
 from django.contrib.auth.base_user import BaseUserManager
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.password_validation import validate_password
-from django.db import models
-from django.db.models.signals import post_save
+from django.contrib.postgres.indexes import GinIndex
+from django.core.mail import EmailMultiAlternatives
+from django.db import models, transaction, IntegrityError, connections
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_init, post_save, post_delete, pre_migrate
 from django.dispatch import receiver
+from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
 from simple_history.models import HistoricalRecords
 from . import constants
+from .functions.catalog import bump_catalog_version
+from .functions.backpack_summary import summarize_backpack_list
 
 
 class MyUserManager(BaseUserManager):
@@ -56,6 +62,31 @@ class CreatedUpdated(models.Model):
         abstract = True
 
 
+class QueuedEmail(CreatedUpdated):
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(default='', blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt = models.DateTimeField(default=timezone.now)
+    sent = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(default='', blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['next_attempt'], condition=models.Q(sent=None), name='queued_email_due')]
+
+    def __str__(self):
+        return self.subject
+
+    def to_message(self, connection=None):
+        message = EmailMultiAlternatives(self.subject, self.body, self.from_email, self.recipients,
+                                         connection=connection)
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+
 class TrackedHistory(models.Model):
     history = HistoricalRecords(inherit=True)
 
@@ -66,6 +97,7 @@ class TrackedHistory(models.Model):
 class Profile(models.Model):
     user = models.OneToOneField(MyUser, related_name='profile', on_delete=models.CASCADE, primary_key=True)
     private_gear = models.JSONField(default=list)
+    updated = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.user.__str__()
@@ -82,11 +114,42 @@ class Backpack(CreatedUpdated):
     name = models.CharField(max_length=constants.backpack_max_name_length, default='', blank=True)
     description = models.TextField(max_length=constants.backpack_max_description_length, default='', blank=True)
     list = models.JSONField(default=list)
+    summary = models.JSONField(default=dict, editable=False)
     shared = models.BooleanField(default=False)
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.summary = summarize_backpack_list(self.list)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'list' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'summary'}
+        super().save(*args, **kwargs)
+
+
+class ImportJob(CreatedUpdated):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'queued'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed')]
+    LIGHTERPACK = 'lp'
+    SOURCE_CHOICES = [(LIGHTERPACK, 'lighterpack')]
+
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='import_jobs')
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES, default=LIGHTERPACK)
+    url = models.URLField(max_length=500)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    backpack = models.ForeignKey(Backpack, on_delete=models.SET_NULL, null=True, blank=True)
+    error = models.TextField(default='', blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['created'], condition=models.Q(status='queued'), name='import_job_queued')]
+
+    def __str__(self):
+        return self.url
+
 
 class Brand(CreatedUpdated, TrackedHistory):
     name = models.CharField(max_length=100, unique=True)
@@ -118,29 +181,54 @@ class Subcategory(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    def with_related(self):
+        # everything ProductSerializer needs, so serializing a list costs a constant number of queries
+        reviews_count = Review.objects.filter(product=models.OuterRef('pk')).order_by().values('product').annotate(
+            count=models.Count('id')).values('count')
+        return self.select_related('brand', 'subcategory').annotate(
+            reviews_count=Coalesce(models.Subquery(reviews_count, output_field=models.IntegerField()), 0))
+
+
 class Product(CreatedUpdated, TrackedHistory):
     author = models.ForeignKey(Profile, on_delete=models.CASCADE)
     brand = models.ForeignKey(Brand, on_delete=models.PROTECT)
     subcategory = models.ForeignKey(Subcategory, on_delete=models.PROTECT)
     name = models.CharField(max_length=constants.product_name_max_length)
     url = models.URLField(default='', blank=True)
+    search_name = models.TextField(default='', editable=False)  # denormalized full_name, trigram indexed
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         constraints = [models.UniqueConstraint(fields=['brand', 'subcategory', 'name'], name='product_constraint')]
+        indexes = [GinIndex(fields=['search_name'], name='product_search_name_trgm', opclasses=['gin_trgm_ops'])]
 
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.search_name = self.full_name
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'search_name'}
+        super().save(*args, **kwargs)
+
     @property
     def reviews_amount(self):
+        if hasattr(self, 'reviews_count'):
+            return self.reviews_count
         return self.reviews.count()
 
+    @staticmethod
+    def make_full_name(subcategory_name, brand_name, name):
+        if subcategory_name != 'inne':
+            return f'{subcategory_name} {brand_name} {name}'
+        else:
+            return f'{brand_name} {name}'
+
     @property
     def full_name(self):
-        if self.subcategory.name != 'inne':
-            return f'{self.subcategory.name} {self.brand.name} {self.name}'
-        else:
-            return f'{self.brand.name} {self.name}'
+        return self.make_full_name(self.subcategory.name, self.brand.name, self.name)
 
 
 class Review(CreatedUpdated, TrackedHistory):
@@ -153,6 +241,99 @@ class Review(CreatedUpdated, TrackedHistory):
 
     class Meta:  # test if constraint are the same as serializers validators?
         constraints = [models.UniqueConstraint(fields=['author', 'product'], name='review_constraint')]
+        indexes = [models.Index(fields=['product', '-created', '-id'], name='review_product_created')]
 
     def __str__(self):
         return self.summary
+
+
+class HourlyStats(models.Model):
+    """per hour counters, incremented when events happen, so stats of any range are read from few rows"""
+    COUNTERS = ['signups', 'activations', 'backpacks_created', 'backpacks_updated', 'imports_lp', 'imports_lp_csv',
+                'imports_hg', 'imports_excel', 'reviews']
+
+    hour = models.DateTimeField(unique=True)
+    signups = models.PositiveIntegerField(default=0)
+    activations = models.PositiveIntegerField(default=0)
+    backpacks_created = models.PositiveIntegerField(default=0)
+    backpacks_updated = models.PositiveIntegerField(default=0)
+    imports_lp = models.PositiveIntegerField(default=0)
+    imports_lp_csv = models.PositiveIntegerField(default=0)
+    imports_hg = models.PositiveIntegerField(default=0)
+    imports_excel = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'hourly stats'
+
+    def __str__(self):
+        return str(self.hour)
+
+    @staticmethod
+    def truncate(moment):
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @classmethod
+    def increment(cls, counter, amount=1, at=None):
+        hour = cls.truncate(at or timezone.now())
+        increment = {counter: models.F(counter) + amount}
+        if cls.objects.filter(hour=hour).update(**increment):
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(hour=hour, **{counter: amount})
+        except IntegrityError:  # row of this hour was created concurrently
+            cls.objects.filter(hour=hour).update(**increment)
+
+
+@receiver(post_save, sender=MyUser)
+def count_signup(sender, created=False, raw=False, **kwargs):
+    if created and not raw:
+        HourlyStats.increment('signups')
+
+
+@receiver(post_save, sender=Backpack)
+def count_backpack_save(sender, created=False, raw=False, **kwargs):
+    if not raw:
+        HourlyStats.increment('backpacks_created' if created else 'backpacks_updated')
+
+
+@receiver(post_save, sender=Review)
+def count_review(sender, created=False, raw=False, **kwargs):
+    if created and not raw:
+        HourlyStats.increment('reviews')
+
+
+@receiver([post_save, post_delete], sender=Brand)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Subcategory)
+def update_catalog_version(sender, **kwargs):
+    # after commit, otherwise other workers could cache old rows under the new version
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(pre_migrate)
+def create_trigram_extension(sender, app_config=None, using='default', **kwargs):
+    # gin_trgm_ops index of Product.search_name and trigram lookups need pg_trgm, generated migrations
+    # are not kept in repository so the extension is created here, before migrations of this app run
+    if app_config.label == 'app':
+        with connections[using].cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+
+@receiver(post_init, sender=Brand)
+@receiver(post_init, sender=Subcategory)
+def remember_loaded_name(sender, instance=None, **kwargs):
+    instance._loaded_name = instance.__dict__.get('name')  # __dict__, so deferred name is not loaded here
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Subcategory)
+def update_products_search_name(sender, instance=None, created=False, **kwargs):
+    if created or instance.name == instance._loaded_name:
+        return
+    products = list(instance.product_set.select_related('brand', 'subcategory'))
+    for product in products:
+        product.search_name = product.full_name
+    Product.objects.bulk_update(products, ['search_name'], batch_size=500)
+    instance._loaded_name = instance.name
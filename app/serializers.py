@@ -1,8 +1,10 @@
 from rest_framework import serializers, validators
 from django.contrib.auth.password_validation import validate_password
 
-from .models import MyUser, Profile, Backpack, Category, Subcategory, Brand, Product, Review
+from .models import MyUser, Profile, Backpack, Category, Subcategory, Brand, Product, Review, ImportJob
 from .fields import CurrentProfileDefault
+from .functions.pagination import newest_first_page
+from . import constants
 
 
 class ModelRepresentationPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
@@ -71,16 +73,35 @@ class ProductSerializer(DynamicFieldsModelSerializer):
     brand = ModelRepresentationPrimaryKeyRelatedField(queryset=Brand.objects.all(), serializer=BrandSerializer)
     subcategory = ModelRepresentationPrimaryKeyRelatedField(queryset=Subcategory.objects.all(),
                                                             serializer=SubcategorySerializer)
-    reviews = ReviewSerializer(many=True, read_only=True)
+    # only the first page of reviews, next pages come from products/<id>/reviews
+    reviews = serializers.SerializerMethodField()
+    reviews_next_cursor = serializers.SerializerMethodField()
+    reviews_page_size = 10
 
     class Meta:
         model = Product
-        fields = ['id', 'author', 'name', 'full_name', 'brand', 'subcategory', 'url', 'reviews_amount', 'reviews']
-        read_only_fields = ['id', 'full_name', 'reviews_amount', 'reviews']
+        fields = ['id', 'author', 'name', 'full_name', 'brand', 'subcategory', 'url', 'reviews_amount', 'reviews',
+                  'reviews_next_cursor']
+        read_only_fields = ['id', 'full_name', 'reviews_amount', 'reviews', 'reviews_next_cursor']
         validators = [
             validators.UniqueTogetherValidator(queryset=Product.objects.all(), fields=['brand', 'subcategory', 'name'])
         ]
 
+    def reviews_page(self, obj):
+        if not hasattr(self, '_reviews_pages'):
+            self._reviews_pages = {}
+        if obj.pk not in self._reviews_pages:
+            self._reviews_pages[obj.pk] = newest_first_page(obj.reviews.all(), self.reviews_page_size)
+        return self._reviews_pages[obj.pk]
+
+    def get_reviews(self, obj):
+        reviews, has_more, next_cursor = self.reviews_page(obj)
+        return ReviewSerializer(reviews, many=True).data
+
+    def get_reviews_next_cursor(self, obj):
+        reviews, has_more, next_cursor = self.reviews_page(obj)
+        return next_cursor
+
 
 class CategorySerializer(serializers.ModelSerializer):
     subcategories = SubcategorySerializer(many=True, read_only=True)
@@ -97,6 +118,31 @@ class PrivateGearSerializer(serializers.ModelSerializer):
         extra_kwargs = {'private_gear': {'required': True}}
 
 
+class GearItemSerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=0)
+    name = serializers.CharField(max_length=constants.item_max_name_len, allow_blank=True, trim_whitespace=False)
+    description = serializers.CharField(max_length=constants.item_max_description_len, allow_blank=True,
+                                        trim_whitespace=False, required=False)
+    weight = serializers.FloatField(min_value=0, max_value=constants.item_max_weight, required=False)
+
+
+class GearCategorySerializer(serializers.Serializer):
+    id = serializers.IntegerField(min_value=0)
+    name = serializers.CharField(max_length=constants.cat_max_name_len, allow_blank=True, trim_whitespace=False)
+    items = GearItemSerializer(many=True, required=False)
+
+
+class GearOperationSerializer(serializers.Serializer):
+    """shape of one private gear operation, ids are checked against private gear when it is applied"""
+    op = serializers.ChoiceField(choices=['add', 'update', 'move', 'delete'])
+    category_id = serializers.IntegerField(min_value=0, required=False)
+    item_id = serializers.IntegerField(min_value=0, required=False)
+    category = GearCategorySerializer(required=False)
+    item = GearItemSerializer(required=False)
+    value = serializers.DictField(required=False)
+    position = serializers.IntegerField(min_value=0, required=False)
+
+
 class BackpackSerializer(serializers.ModelSerializer):
     profile = serializers.PrimaryKeyRelatedField(
         default=CurrentProfileDefault(),
@@ -113,7 +159,23 @@ class BackpackSerializer(serializers.ModelSerializer):
         if self.context['request'].user.is_anonymous:
             return False
         profile = self.context['request'].user.profile
-        return profile == obj.profile
+        return profile.pk == obj.profile_id
+
+
+class BackpackSummarySerializer(BackpackSerializer):
+    class Meta:
+        model = Backpack
+        fields = ['id', 'created', 'updated', 'profile', 'is_owner', 'shared', 'name', 'description', 'summary']
+        read_only_fields = ['id', 'created', 'updated', 'is_owner', 'summary']
+
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    backpack = BackpackSerializer(read_only=True)
+
+    class Meta:
+        model = ImportJob
+        fields = ['id', 'created', 'updated', 'source', 'url', 'status', 'error', 'backpack']
+        read_only_fields = fields
 
 
 class UserSerializer(serializers.ModelSerializer):
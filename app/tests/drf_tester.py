@@ -1,5 +1,12 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
 from rest_framework.test import APIClient
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
 from app.models import MyUser
 
@@ -36,6 +43,16 @@ class DRFTesterCase(TestCase):
         if cls.url is None:
             raise DRFTesterException('url not declared!')
 
+    @contextmanager
+    def run_on_commit_callbacks(self):
+        """TestCase never commits, so callbacks registered by transaction.on_commit inside the block are run here"""
+        start = len(connection.run_on_commit)
+        yield
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for savepoint_ids, callback in callbacks:
+            callback()
+
     def login_client(self, user_instance):
         self.client.force_login(user_instance)
 
@@ -51,3 +68,47 @@ class DRFTesterCase(TestCase):
 
     def status_check(self, response, code):
         self.assertEqual(response.status_code, code)
+
+
+class DRFBudgetTesterCase(DRFTesterCase):
+    """
+    DRFTesterCase that checks query count of requests and writes them with wall clock time into json report,
+    time budgets are checked only with RUN_BENCHMARKS set, timings on shared CI machines are not reliable
+    """
+    report_path = os.environ.get('BUDGET_REPORT_PATH', 'budget_report.json')
+    check_time = bool(os.environ.get('RUN_BENCHMARKS'))
+    report = None
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.report = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        with open(cls.report_path, 'w') as report_file:
+            json.dump({'case': cls.__name__, 'requests': cls.report}, report_file, indent=2, sort_keys=True)
+        super().tearDownClass()
+
+    def budget_check(self, name, method, url, max_queries, max_seconds, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            # streamed bodies are generated while being read, so they count into the budget
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            seconds = time.perf_counter() - start
+        self.report[name] = {
+            'method': method.upper(),
+            'url': url,
+            'status': response.status_code,
+            'queries': len(queries),
+            'max_queries': max_queries,
+            'seconds': round(seconds, 4),
+            'max_seconds': max_seconds,
+            'response_bytes': len(content),
+        }
+        self.assertLessEqual(len(queries), max_queries, f'{name} query budget exceeded:\n' +
+                             '\n'.join(query['sql'] for query in queries.captured_queries))
+        if self.check_time:
+            self.assertLessEqual(seconds, max_seconds, f'{name} time budget exceeded')
+        return response
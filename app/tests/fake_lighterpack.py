@@ -0,0 +1,59 @@
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import threading
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+def read_fixture(name):
+    return (FIXTURES_DIR / name).read_text(encoding='utf-8')
+
+
+class FakeLighterpack:
+    """serves html pages on localhost like lighterpack.com/r/<list_id>, unknown lists get 400 like on lighterpack"""
+
+    def __init__(self, lists):
+        self.lists = lists
+        self.requests = []
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                list_id = self.path.rsplit('/', 1)[-1]
+                if list_id in fake.lists:
+                    body = fake.lists[list_id].encode()
+                    etag = '"' + hashlib.md5(body).hexdigest() + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        fake.requests.append((self.path, 304))
+                        self.send_response(304)
+                        self.end_headers()
+                        return
+                    fake.requests.append((self.path, 200))
+                    self.send_response(200)
+                    self.send_header('ETag', etag)
+                else:
+                    body = b'bad request'
+                    fake.requests.append((self.path, 400))
+                    self.send_response(400)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def url(self, list_id):
+        return f'http://127.0.0.1:{self.server.server_port}/r/{list_id}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
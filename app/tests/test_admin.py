@@ -0,0 +1,50 @@
+from django.contrib.auth import SESSION_KEY
+from django.contrib.sessions.models import Session
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from app.models import MyUser, Backpack
+from app.paginators import EstimatedCountPaginator
+
+
+class AdminChangelistTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = MyUser.objects.create_superuser(email='admin@email.com', password='fasf3qf3ff')
+        for x in range(5):
+            user = MyUser.objects.create_user(email=f'user{x}@email.com', password='fasf3qf3ff')
+            Backpack.objects.bulk_create([Backpack(profile=user.profile, list=[{'id': 0}]) for y in range(x)])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, queries
+
+    def test_profile_changelist(self):
+        response, queries = self.changelist_queries('/admin/app/profile/')
+        amounts = sorted(profile.backpacks_amount for profile in response.context['cl'].result_list)
+        self.assertEqual(amounts, [0, 0, 1, 2, 3, 4])
+        self.assertFalse(any('private_gear' in query['sql'] for query in queries.captured_queries))
+
+    def test_backpack_changelist(self):
+        response, queries = self.changelist_queries('/admin/app/backpack/')
+        self.assertLess(len(queries), 10)
+        self.assertFalse(any('"app_backpack"."list"' in query['sql'] for query in queries.captured_queries))
+
+    def test_session_changelist(self):
+        response = self.client.get('/admin/sessions/session/')
+        self.assertEqual(response.status_code, 200)
+        session = Session.objects.get()
+        response = self.client.get(f'/admin/sessions/session/{session.session_key}/change/')
+        self.assertContains(response, SESSION_KEY)
+
+    def test_estimated_count_paginator(self):
+        paginator = EstimatedCountPaginator(Backpack.objects.order_by('id'), 100)
+        self.assertEqual(paginator.count, 10)  # small table is counted exactly
+        paginator = EstimatedCountPaginator(Backpack.objects.filter(profile=self.admin.profile).order_by('id'), 100)
+        self.assertEqual(paginator.count, 0)
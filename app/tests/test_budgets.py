@@ -0,0 +1,225 @@
+from django.contrib.auth.tokens import default_token_generator
+from django.utils.encoding import force_bytes
+from django.utils import timezone
+from django.utils.http import urlsafe_base64_encode
+from openpyxl import Workbook
+import io
+
+from app import constants
+from app.models import MyUser, Backpack, Brand, Category, Subcategory, Product, Review, HourlyStats
+from .drf_tester import DRFBudgetTesterCase
+
+
+def generate_backpack_list():
+    return [{
+        'id': cat_id,
+        'name': f'category {cat_id}',
+        'items': [{
+            'id': cat_id * constants.items_in_category_max_amount + item_id,
+            'name': f'item {item_id}',
+            'description': 'description ' * 10,
+            'weight': 100 + item_id,
+            'worn': item_id == 0,
+            'consumable': item_id == 1,
+            'quantity': 1,
+        } for item_id in range(constants.items_in_category_max_amount)]
+    } for cat_id in range(constants.categories_max_amount)]
+
+
+class APIBudgetTestCase(DRFBudgetTesterCase):
+    """
+    query and time budgets for every route in app/urls.py, seeded with realistic data volumes,
+    budgets are upper bounds, not exact values - lower them when a route gets faster
+    """
+    url = '/api/'
+    products_amount = 2000
+    seconds = 1.0
+    password_seconds = 3.0  # routes that hash passwords
+
+    @classmethod
+    def moreSetUpTestTestData(cls):
+        profile = cls.user1.profile
+        backpack_list = generate_backpack_list()
+        Backpack.objects.bulk_create([Backpack(profile=profile, name=f'backpack {x}', list=backpack_list)
+                                      for x in range(constants.max_backpacks_amount)])
+        cls.backpack = Backpack.objects.create(profile=profile, name='backpack', list=backpack_list, shared=True)
+        profile.private_gear = backpack_list
+        profile.save()
+
+        brands = Brand.objects.bulk_create([Brand(name=f'brand {x}', author=profile) for x in range(50)])
+        categories = Category.objects.bulk_create([Category(name=f'category {x}') for x in range(16)])
+        subcategories = Subcategory.objects.bulk_create([Subcategory(name=f'subcategory {x}', category=category)
+                                                         for category in categories for x in range(10)])
+        products = []
+        for x in range(cls.products_amount):
+            brand = brands[x % len(brands)]
+            subcategory = subcategories[x % len(subcategories)]
+            name = f'namiot {x}'
+            products.append(Product(author=profile, brand=brand, subcategory=subcategory, name=name,
+                                    search_name=Product.make_full_name(subcategory.name, brand.name, name)))
+        products = Product.objects.bulk_create(products)
+        Review.objects.bulk_create([Review(author=user.profile, product=product, summary='summary', text='text' * 1000)
+                                    for product in products for user in (cls.user1, cls.user2)])
+        cls.product = products[0]
+        cls.brand = brands[0]
+        cls.subcategory = subcategories[0]
+        cls.review = Review.objects.get(author=profile, product=cls.product)
+
+    def test_initial(self):
+        self.login_client(self.user1)
+        # first request builds catalog and stores it with catalog version in cache
+        response = self.budget_check('initial_cold_cache', 'get', '/api/initial', 22, self.seconds * 2)
+        self.status_check(response, 200)
+        response = self.budget_check('initial', 'get', '/api/initial', 10, self.seconds * 2)
+        self.status_check(response, 200)
+        response = self.budget_check('initial_not_modified', 'get', '/api/initial', 5, self.seconds,
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.status_check(response, 304)
+
+    def test_login_logout(self):
+        response = self.budget_check('login', 'post', '/api/login', 10, self.password_seconds, data=self.user1data)
+        self.status_check(response, 200)
+        response = self.budget_check('logout', 'post', '/api/logout', 5, self.seconds)
+        self.status_check(response, 200)
+
+    def test_private_gear(self):
+        self.login_client(self.user1)
+        response = self.budget_check('private_gear', 'patch', '/api/private_gear', 6, self.seconds,
+                                     data={'private_gear': generate_backpack_list()}, format='json')
+        self.status_check(response, 200)
+        response = self.budget_check('private_gear_export', 'get', '/api/private_gear/export', 5, self.seconds)
+        self.status_check(response, 200)
+        operations = [{'op': 'update', 'item_id': 0, 'value': {'name': 'new name'}}]
+        response = self.budget_check('private_gear_operations', 'post', '/api/private_gear/operations', 8,
+                                     self.seconds, data={'operations': operations}, format='json')
+        self.status_check(response, 200)
+
+    def test_import_from_lp(self):
+        self.login_client(self.user1)
+        response = self.budget_check('import_from_lp', 'post', '/api/import_from_lp', 6, self.seconds,
+                                     data={'url': 'https://lighterpack.com/r/ttdjjm'})
+        self.status_check(response, 202)
+        response = self.budget_check('import_jobs', 'get', f"/api/import_jobs/{response.json()['id']}", 5,
+                                     self.seconds)
+        self.status_check(response, 200)
+
+    def test_import_from_lp_csv(self):
+        rows = ['Item Name,Category,desc,qty,weight,unit,url,price,worn,consumable']
+        rows += [f'item {x},category {x // 30},,1,{x},gram,,0,,' for x in range(480)]
+        csv_file = io.BytesIO('\n'.join(rows).encode())
+        csv_file.name = 'list.csv'
+        self.login_client(self.user1)
+        response = self.budget_check('import_from_lp_csv', 'post', '/api/import_from_lp_csv', 8, self.seconds,
+                                     data={'csv': csv_file})
+        self.status_check(response, 201)
+
+    def test_import_from_hg(self):
+        self.login_client(self.user2)
+        response = self.budget_check('import_from_hg', 'post', '/api/import_from_hg', 8, self.seconds,
+                                     data={'backpack_id': self.backpack.id})
+        self.status_check(response, 201)
+
+    def test_import_from_excel(self):
+        workbook = Workbook()
+        for x in range(1999):
+            workbook.active.append([f'item {x}', 'description', x])
+        excel_file = io.BytesIO()
+        workbook.save(excel_file)
+        excel_file.seek(0)
+        excel_file.name = 'private.xlsx'
+        self.login_client(self.user1)
+        response = self.budget_check('import_from_excel', 'post', '/api/import_from_excel', 6, self.seconds,
+                                     data={'excel': excel_file})
+        self.status_check(response, 200)
+
+    def test_hourly_stats(self):
+        end = HourlyStats.truncate(timezone.now())
+        start = end - timezone.timedelta(days=365)
+        HourlyStats.objects.all().delete()
+        HourlyStats.objects.bulk_create([HourlyStats(hour=start + timezone.timedelta(hours=x), signups=x % 3, reviews=1)
+                                         for x in range(365 * 24)])
+        self.login_client(MyUser.objects.create_superuser(email='admin@email.com', password='fasf3qf3ff'))
+        for bucket in ['day', 'hour']:
+            response = self.budget_check(f'stats_{bucket}', 'get', '/api/stats', 4, self.seconds * 2,
+                                         data={'start': start.isoformat(), 'end': end.isoformat(), 'bucket': bucket})
+            self.status_check(response, 200)
+            self.assertEqual(response.json()['totals']['reviews'], 365 * 24)
+
+    def test_search_for_product(self):
+        self.login_client(self.user1)
+        response = self.budget_check('search_for_product', 'get', '/api/search_for_product', 8, self.seconds,
+                                     data={'query': 'namiot brand 1'})
+        self.status_check(response, 200)
+        self.assertLessEqual(len(response.json()['results']), 50)
+
+    def test_users(self):
+        response = self.budget_check('users_create', 'post', '/api/users', 8, self.password_seconds,
+                                     data={'email': 'new@email.com', 'password': '137sword3%'})
+        self.status_check(response, 201)
+        response = self.budget_check('users_reset_password_start', 'post', '/api/users/reset_password_start', 4,
+                                     self.seconds, data={'email': self.user1.email})
+        self.status_check(response, 200)
+        user = MyUser.objects.get(id=self.user1.id)
+        data = {'uidb64': urlsafe_base64_encode(force_bytes(user.id)),
+                'token': default_token_generator.make_token(user), 'password': '137sword4%'}
+        response = self.budget_check('users_reset_password', 'post', '/api/users/reset_password', 10,
+                                     self.password_seconds, data=data)
+        self.status_check(response, 200)
+        data = {'old_password': '137sword4%', 'new_password': '137sword5%'}
+        response = self.budget_check('users_change_password', 'patch', '/api/users/change_password', 12,
+                                     self.password_seconds, data=data)
+        self.status_check(response, 200)
+
+    def test_backpacks(self):
+        self.login_client(self.user1)
+        url = f'/api/backpacks/{self.backpack.id}'
+        response = self.budget_check('backpacks_retrieve', 'get', url, 8, self.seconds)
+        self.status_check(response, 200)
+        response = self.budget_check('backpacks_summaries', 'get', '/api/backpacks/summaries', 6, self.seconds)
+        self.status_check(response, 200)
+        response = self.budget_check('backpacks_export', 'get', url + '/export', 5, self.seconds,
+                                     data={'extension': 'csv'})
+        self.status_check(response, 200)
+        response = self.budget_check('backpacks_export_all', 'get', '/api/backpacks/export', 6, self.seconds * 3)
+        self.status_check(response, 200)
+        list_patch = [{'op': 'replace', 'path': '/0/items/0/name', 'value': 'new name'}]
+        response = self.budget_check('backpacks_list_patch', 'patch', url, 8, self.seconds,
+                                     data={'list_patch': list_patch}, format='json')
+        self.status_check(response, 200)
+        response = self.budget_check('backpacks_partial_update', 'patch', url, 10, self.seconds,
+                                     data={'list': generate_backpack_list()}, format='json')
+        self.status_check(response, 200)
+        response = self.budget_check('backpacks_create', 'post', '/api/backpacks', 8, self.seconds,
+                                     data={'name': 'new', 'list': generate_backpack_list()}, format='json')
+        self.status_check(response, 201)
+        response = self.budget_check('backpacks_destroy', 'delete', url, 10, self.seconds)
+        self.status_check(response, 204)
+
+    def test_products(self):
+        self.login_client(self.user1)
+        response = self.budget_check('products_retrieve', 'get', f'/api/products/{self.product.id}', 6, self.seconds)
+        self.status_check(response, 200)
+        response = self.budget_check('products_reviews', 'get', f'/api/products/{self.product.id}/reviews', 6,
+                                     self.seconds)
+        self.status_check(response, 200)
+        data = {'name': 'new product', 'brand': self.brand.id, 'subcategory': self.subcategory.id}
+        response = self.budget_check('products_create', 'post', '/api/products', 15, self.seconds, data=data)
+        self.status_check(response, 201)
+        response = self.budget_check('products_partial_update', 'patch', f'/api/products/{self.product.id}', 15,
+                                     self.seconds, data={'url': 'https://hikegear.pl'})
+        self.status_check(response, 200)
+
+    def test_reviews_and_brands(self):
+        self.login_client(self.user1)
+        product = Product.objects.exclude(id=self.product.id)[0]
+        Review.objects.filter(author=self.user1.profile, product=product).delete()
+        data = {'product': product.id, 'summary': 'summary', 'text': 'text'}
+        response = self.budget_check('reviews_create', 'post', '/api/reviews', 12, self.seconds, data=data)
+        self.status_check(response, 201)
+        response = self.budget_check('reviews_partial_update', 'patch', f'/api/reviews/{self.review.id}', 12,
+                                     self.seconds, data={'summary': 'new summary'})
+        self.status_check(response, 200)
+        response = self.budget_check('reviews_destroy', 'delete', f'/api/reviews/{self.review.id}', 12, self.seconds)
+        self.status_check(response, 204)
+        response = self.budget_check('brands_create', 'post', '/api/brands', 12, self.seconds, data={'name': 'new'})
+        self.status_check(response, 201)
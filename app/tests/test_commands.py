@@ -0,0 +1,166 @@
+import io
+import os
+import tempfile
+
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+
+from app.models import MyUser, Backpack, Brand, Category, Subcategory, Product
+from app.functions.catalog import get_catalog_version
+
+
+class ImportCatalogCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = MyUser.objects.create_superuser(email='admin@email.com', password='fasf3qf3ff')
+        category = Category.objects.create(name='śpiwory')
+        Subcategory.objects.create(category=category, name='puchowe')
+        brand = Brand.objects.create(name='Cumulus')
+        cls.product = Product.objects.create(author=cls.user.profile, brand=brand,
+                                             subcategory=category.subcategories.get(), name='Panyam 450')
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def import_catalog(self, filename, *args):
+        output = io.StringIO()
+        call_command('import_catalog', os.path.join(self.directory.name, filename), *args, stdout=output)
+        return output.getvalue()
+
+    def test_workbook(self):
+        workbook = Workbook()
+        workbook.active.title = 'brands'
+        workbook.active.append(['Cumulus'])
+        workbook.active.append(['Naturehike'])
+        categories = workbook.create_sheet('categories')
+        categories.append(['śpiwory', 'namioty'])
+        categories.append(['puchowe', 'jednoosobowe'])
+        categories.append(['syntetyczne', 'puchowe'])
+        products = workbook.create_sheet('products')
+        products.append(['Panyam 450', 'Cumulus', 'puchowe', 'śpiwory', 'https://cumulus.pl/panyam'])
+        products.append(['Cloud Up 1', 'Naturehike', 'jednoosobowe'])
+        products.append(['Lite 200', 'Cumulus', 'syntetyczne'])
+        products.append(['Ambiguous', 'Cumulus', 'puchowe'])
+        products.append(['Missing', 'Cumulus', 'nieistniejąca'])
+        workbook.save(os.path.join(self.directory.name, 'catalog.xlsx'))
+        version = get_catalog_version()
+
+        output = self.import_catalog('catalog.xlsx')
+        self.assertIn('products_created: 2', output)
+        self.assertIn('products_updated: 1', output)
+        self.assertIn('rows_skipped: 2', output)
+        self.assertEqual(Subcategory.objects.count(), 4)
+        self.assertEqual(Product.objects.get(id=self.product.id).url, 'https://cumulus.pl/panyam')
+        product = Product.objects.get(name='Cloud Up 1')
+        self.assertEqual(product.search_name, 'jednoosobowe Naturehike Cloud Up 1')
+        self.assertEqual(product.author, self.user.profile)
+        self.assertEqual(product.history.count(), 1)
+        self.assertNotEqual(get_catalog_version(), version)
+
+        Product.objects.filter(id=self.product.id).update(search_name='')  # saved before search_name existed
+        self.import_catalog('catalog.xlsx')
+        self.assertEqual(Product.objects.get(id=self.product.id).search_name, 'puchowe Cumulus Panyam 450')
+
+        output = self.import_catalog('catalog.xlsx')  # importing again changes nothing
+        self.assertIn('products_created: 0', output)
+        self.assertIn('products_updated: 0', output)
+
+    def test_csv(self):
+        with open(os.path.join(self.directory.name, 'catalog.csv'), 'w') as csv_file:
+            csv_file.write('name,brand,subcategory,category,url\n'
+                           'Panyam 600,Cumulus,puchowe,,\n'
+                           'Panyam 450,Cumulus,puchowe,śpiwory,\n')
+        output = self.import_catalog('catalog.csv', '--chunk-size', '1')
+        self.assertIn('products_created: 1', output)
+        self.assertIn('products_updated: 0', output)
+        self.assertEqual(Brand.objects.count(), 1)
+
+
+class PruneStaleDataCommandTestCase(TestCase):
+    def test_prune(self):
+        for x in range(5):
+            session = SessionStore()
+            session.set_expiry(-10 if x < 3 else 3600)
+            session.create()
+        old = timezone.now() - timezone.timedelta(days=2)
+        for x in range(3):
+            MyUser.objects.create_user(email=f'stale{x}@email.com', password='fasf3qf3ff', is_active=False)
+        MyUser.objects.filter(email__startswith='stale').update(date_joined=old)
+        MyUser.objects.create_user(email='new@email.com', password='fasf3qf3ff', is_active=False)
+        MyUser.objects.create_user(email='old@email.com', password='fasf3qf3ff', date_joined=old)
+
+        output = io.StringIO()
+        call_command('prune_stale_data', '--chunk-size', '2', stdout=output)
+        self.assertIn('expired sessions: 3 deleted', output.getvalue())
+        self.assertIn('stale inactive users: 3 deleted', output.getvalue())
+        self.assertEqual(Session.objects.count(), 2)
+        self.assertEqual(set(MyUser.objects.values_list('email', flat=True)), {'new@email.com', 'old@email.com'})
+
+
+class BackfillDenormalizedCommandTestCase(TestCase):
+    def backfill(self):
+        output = io.StringIO()
+        call_command('backfill_denormalized', '--chunk-size', '2', stdout=output)
+        return output.getvalue()
+
+    def test_backpack_summaries(self):
+        profile = MyUser.objects.create_user(email='user@email.com', password='fasf3qf3ff').profile
+        gear = [{'id': 0, 'name': 'sleep', 'items': [{'id': 0, 'name': 'quilt', 'weight': 600, 'quantity': 1}]}]
+        for x in range(3):
+            Backpack.objects.create(profile=profile, list=gear)
+        Backpack.objects.create(profile=profile)
+        Backpack.objects.exclude(list=[]).update(summary={})  # saved before summary existed
+
+        self.assertIn('backpack summaries: 3 of 4 updated', self.backfill())
+        for backpack in Backpack.objects.exclude(list=[]):
+            self.assertEqual(backpack.summary['total_weight'], 600)
+        self.assertIn('backpack summaries: 0 of 4 updated', self.backfill())
+
+    def test_product_search_names(self):
+        profile = MyUser.objects.create_user(email='user@email.com', password='fasf3qf3ff').profile
+        subcategory = Subcategory.objects.create(category=Category.objects.create(name='namioty'), name='namiot')
+        brand = Brand.objects.create(name='MSR')
+        for x in range(3):
+            Product.objects.create(author=profile, brand=brand, subcategory=subcategory, name=f'Hubba v{x}')
+        Product.objects.update(search_name='')  # saved before search_name existed
+
+        self.assertIn('product search names: 3 of 3 updated', self.backfill())
+        self.assertEqual(sorted(Product.objects.values_list('search_name', flat=True)),
+                         ['namiot MSR Hubba v0', 'namiot MSR Hubba v1', 'namiot MSR Hubba v2'])
+        self.assertIn('product search names: 0 of 3 updated', self.backfill())
+
+
+@override_settings(HISTORY_RETENTION={
+    'Brand': {'keep_last': 2, 'daily_after_days': 10, 'drop_after_days': 100},
+    'Product': {'keep_last': 2, 'daily_after_days': None, 'drop_after_days': None},
+})
+class PruneHistoryCommandTestCase(TestCase):
+    def test_prune(self):
+        brand = Brand.objects.create(name='brand')
+        other = Brand.objects.create(name='other')
+        history = Brand.history.model
+        now = timezone.now()
+        ages = [200, 200, 50, 50, 50, 40, 5, 5, 1]  # days, oldest first, first one is creation
+        for x in range(len(ages) - 1):
+            brand.name = f'brand {x}'
+            brand.save()
+        for record, age in zip(history.objects.filter(id=brand.id).order_by('history_id'), ages):
+            history.objects.filter(history_id=record.history_id).update(history_date=now - timezone.timedelta(days=age))
+        history.objects.filter(id=other.id).update(history_date=now - timezone.timedelta(days=300))
+
+        output = io.StringIO()
+        call_command('prune_history', '--ids-per-chunk', '1', stdout=output)
+        dates = history.objects.filter(id=brand.id).order_by('history_date').values_list('history_date', flat=True)
+        remaining = [(now - date).days for date in dates]
+        # 200 days old are dropped, one of three 50 days old is kept, last 2 versions are kept anyway
+        self.assertEqual(remaining, [50, 40, 5, 5, 1])
+        self.assertEqual(history.objects.filter(id=other.id).count(), 1)  # last versions are never dropped
+        self.assertIn('Brand', output.getvalue())
+        self.assertIn('reclaimed 4 rows', output.getvalue())
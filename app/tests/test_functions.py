@@ -0,0 +1,177 @@
+import io
+import os
+import socket
+import time
+from unittest import skipUnless
+
+from bs4 import BeautifulSoup
+
+from django.test import SimpleTestCase
+from openpyxl import Workbook
+from rest_framework.exceptions import ValidationError
+from requests.exceptions import ConnectionError
+
+from app.functions.excel_import import scrape_data_from_excel
+from app.functions.gear_ids import GearIds
+from app.functions.http_client import HttpClient, CircuitOpenError
+from app.functions.json_patch import apply_patch, JsonPatchError
+from app.functions.lpscraper import scrape_backpack, lighterpack_pages, parse_backpack_page, convert_lp_backpack
+from app.functions.page_cache import PageCache
+from .fake_lighterpack import FakeLighterpack, read_fixture
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}/r/list'
+
+
+class HttpClientTestCase(SimpleTestCase):
+    def test_get(self):
+        client = HttpClient(retries=0)
+        with FakeLighterpack({'list': 'page'}) as lighterpack:
+            self.assertEqual(client.get(lighterpack.url('list')).text, 'page')
+            self.assertEqual(client.get(lighterpack.url('other')).status_code, 400)
+
+    def test_retries_and_circuit_breaker(self):
+        client = HttpClient(retries=1, backoff=0.01, failure_threshold=4, reset_timeout=60)
+        url = closed_port_url()
+        with self.assertRaises(ConnectionError):
+            client.get(url)
+        with self.assertRaises(ConnectionError):
+            client.get(url)
+        with self.assertRaises(CircuitOpenError):
+            client.get(url)
+
+
+class PageCacheTestCase(SimpleTestCase):
+    def tearDown(self):
+        lighterpack_pages.clear()
+        lighterpack_pages.ttl = PageCache().ttl
+
+    def test_normalize_url(self):
+        self.assertEqual(PageCache.normalize_url('https://LighterPack.com/r/ttdjjm/#list'),
+                         'https://lighterpack.com/r/ttdjjm')
+
+    def test_lru_eviction(self):
+        cache = PageCache(max_entries=2)
+        cache.set('http://a.com/1', 1)
+        cache.set('http://a.com/2', 2)
+        cache.get('http://a.com/1')
+        cache.set('http://a.com/3', 3)
+        self.assertIsNone(cache.get('http://a.com/2'))
+        self.assertEqual(cache.get('http://a.com/1').data, 1)
+
+    def test_scrape_backpack_cache(self):
+        with FakeLighterpack({'ttdjjm': read_fixture('lighterpack_list.html')}) as lighterpack:
+            data = scrape_backpack(lighterpack.url('ttdjjm'))
+            data['name'] = 'modified by caller'
+            self.assertEqual(scrape_backpack(lighterpack.url('ttdjjm') + '/')['name'], 'for testing hikegear.pl')
+            self.assertEqual(lighterpack.requests, [('/r/ttdjjm', 200)])
+            lighterpack_pages.ttl = 0
+            self.assertEqual(scrape_backpack(lighterpack.url('ttdjjm'))['name'], 'for testing hikegear.pl')
+            self.assertEqual(lighterpack.requests, [('/r/ttdjjm', 200), ('/r/ttdjjm', 304)])
+
+
+def reference_parse_backpack_page(html):
+    """full BeautifulSoup parse that was used before LighterpackPageParser, kept to compare results and speed"""
+    results_data = {}
+    soup = BeautifulSoup(html, 'html.parser')
+    results_data['name'] = soup.find('h1', class_='lpListName').text
+
+    description = soup.find(id='lpListDescription')
+    if description:
+        results_data['description'] = description.find('p').text
+    else:
+        results_data['description'] = ''
+
+    results_data['categories'] = []
+    categories = soup.find_all('li', class_='lpCategory')
+    for category in categories:
+        cat_data = {'name': category.find('h2', class_='lpCategoryName').text, 'items': []}
+        items = category.find_all('li', class_='lpItem')
+        for item in items:
+            item_data = {
+                'name': item.find('span', class_='lpName').text.strip(),
+                'description': item.find('span', class_='lpDescription').text.strip(),
+                'worn': bool(item.find('i', class_='lpSprite lpWorn lpActive')),
+                'consumable': bool(item.find('i', class_='lpSprite lpConsumable lpActive')),
+                'weight': item.find('span', class_='lpWeight').text,
+                'unit': item.find('div', class_='lpUnitSelect').find('span', class_='lpDisplay').text,
+                'quantity': item.find('span', class_='lpQtyCell').text.strip()
+            }
+            cat_data['items'].append(item_data)
+        results_data['categories'].append(cat_data)
+    return results_data
+
+
+def best_time(function, html, runs=3):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function(html)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+class LighterpackParserTestCase(SimpleTestCase):
+    fixtures_pages = ['lighterpack_list.html', 'lighterpack_list_large.html']
+
+    def test_same_results_as_reference(self):
+        for page in self.fixtures_pages:
+            html = read_fixture(page)
+            self.assertEqual(convert_lp_backpack(parse_backpack_page(html)),
+                             convert_lp_backpack(reference_parse_backpack_page(html)))
+
+    @skipUnless(os.environ.get('RUN_BENCHMARKS'), 'wall-clock comparison, set RUN_BENCHMARKS=1 to run it')
+    def test_faster_than_reference(self):
+        html = read_fixture('lighterpack_list_large.html')  # 16 categories, 480 items
+        reference = best_time(reference_parse_backpack_page, html)
+        streaming = best_time(parse_backpack_page, html)
+        print(f'\nlighterpack parser: reference {reference:.4f}s, streaming {streaming:.4f}s, '
+              f'{reference / streaming:.1f}x faster')
+        self.assertLess(streaming * 2, reference, f'reference: {reference:.4f}s, streaming: {streaming:.4f}s')
+
+
+class JsonPatchTestCase(SimpleTestCase):
+    def test_test_operation_is_type_strict(self):
+        document = [{'id': 0, 'worn': False, 'weight': 1, 'items': [{'quantity': 1.0}]}]
+        for path, value in [('/0/worn', 0), ('/0/weight', True), ('/0/weight', '1'), ('/0/items', [{'quantity': True}]),
+                            ('/0', {'id': 0, 'worn': 0, 'weight': 1, 'items': [{'quantity': 1}]})]:
+            with self.assertRaises(JsonPatchError):
+                apply_patch(document, [{'op': 'test', 'path': path, 'value': value}])
+        for path, value in [('/0/worn', False), ('/0/weight', 1.0), ('/0/items', [{'quantity': 1}])]:
+            apply_patch(document, [{'op': 'test', 'path': path, 'value': value}])
+
+
+class ExcelImportTestCase(SimpleTestCase):
+    @staticmethod
+    def excel_file(rows):
+        workbook = Workbook()
+        for row in rows:
+            workbook.active.append(row)
+        excel_file = io.BytesIO()
+        workbook.save(excel_file)
+        excel_file.seek(0)
+        return excel_file
+
+    def test_free_ids(self):
+        private_gear = [{'id': 0, 'name': 'cat', 'items': [{'id': 0}, {'id': 2}]},
+                        {'id': 2, 'name': 'cat', 'items': []}]
+        rows = [['a', '', 1], ['b', '', 2], ['kategoria', 'new'], ['c', '', 3]]
+        data = scrape_data_from_excel(self.excel_file(rows), private_gear)['private_gear']
+        self.assertEqual([cat['id'] for cat in data], [0, 2, 1, 3])
+        self.assertEqual([item['id'] for item in data[2]['items'] + data[3]['items']], [1, 3, 4])
+
+    def test_too_many_rows(self):
+        rows = [[f'item {x}', '', x] for x in range(2001)]
+        with self.assertRaises(ValidationError):
+            scrape_data_from_excel(self.excel_file(rows), [])
+
+
+class GearIdsTestCase(SimpleTestCase):
+    def test_new_ids(self):
+        ids = GearIds([{'id': 1, 'items': [{'id': 0}, {'id': 1}, {'id': 3}]}], categories_limit=3)
+        self.assertEqual([ids.new_category_id() for x in range(3)], [0, 2, None])
+        self.assertEqual([ids.new_item_id() for x in range(3)], [2, 4, 5])
@@ -2,9 +2,11 @@ from django.utils import timezone
 
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from app.models import MyUser, Profile, Backpack, Brand, Category, Subcategory, Product, Review
+from app.models import MyUser, Profile, Backpack, Brand, Category, Subcategory, Product, Review, HourlyStats
 
 
 class SetUpProduct(TestCase):
@@ -51,6 +53,25 @@ class ProductModelTestCase(SetUpProduct):
                                           subcategory=subcategory2, name=self.product_name)
         self.assertEqual(product2.full_name, f'{self.brand.name} {self.product.name}')
 
+    def test_search_name(self):
+        self.assertEqual(self.product.search_name, self.product.full_name)
+        self.brand.name = 'new_brand_name'
+        self.brand.save()
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual(product.search_name, f'{self.subcategory.name} new_brand_name {self.product.name}')
+        subcategory = Subcategory.objects.get(id=self.subcategory.id)
+        subcategory.name = 'new_subcategory_name'
+        subcategory.save()
+        product = Product.objects.get(id=self.product.id)
+        self.assertEqual(product.search_name, f'new_subcategory_name new_brand_name {self.product.name}')
+
+    def test_search_name_kept_without_rename(self):
+        brand = Brand.objects.get(id=self.brand.id)
+        with CaptureQueriesContext(connection) as queries:
+            brand.save()
+            self.brand.save()
+        self.assertFalse([query for query in queries.captured_queries if 'app_product' in query['sql']])
+
     def test_created_updated(self):
         self.assertLess((timezone.now() - self.product.created).total_seconds(), 0.01)
         self.assertLess((timezone.now() - self.product.updated).total_seconds(), 0.01)
@@ -106,6 +127,21 @@ class BackpackModelTestCase(TestCase):
         self.assertLess((timezone.now() - self.backpack.created).total_seconds(), 0.01)
         self.assertLess((timezone.now() - self.backpack.updated).total_seconds(), 0.01)
 
+    def test_summary(self):
+        self.backpack.list = [{'id': 0, 'name': 'cat', 'items': [
+            {'id': 0, 'weight': 100, 'quantity': 2},
+            {'id': 1, 'weight': 500, 'quantity': 1, 'worn': True},
+            {'id': 2, 'weight': 300, 'quantity': 1, 'consumable': True},
+        ]}]
+        self.backpack.save()
+        summary = self.model.objects.get(id=self.backpack.id).summary
+        self.assertEqual(summary['total_weight'], 1000)
+        self.assertEqual(summary['base_weight'], 200)
+        self.assertEqual(summary['worn_weight'], 500)
+        self.assertEqual(summary['consumable_weight'], 300)
+        self.assertEqual(summary['items_amount'], 3)
+        self.assertEqual(summary['categories'], [{'id': 0, 'name': 'cat', 'weight': 1000, 'items_amount': 3}])
+
 
 class ProfileModelTestCase(TestCase):
     user_model = MyUser
@@ -149,3 +185,22 @@ class MyUserModelTestCase(TestCase):
     def test_email_is_required(self):
         with self.assertRaises(TypeError):
             self.model.objects.create_user(password='fvava23f')
+
+
+class HourlyStatsModelTestCase(TestCase):
+    def test_increment(self):
+        at = timezone.now().replace(minute=30)
+        HourlyStats.increment('reviews', at=at)
+        HourlyStats.increment('reviews', 2, at=at.replace(minute=59))
+        HourlyStats.increment('reviews', at=at + timezone.timedelta(hours=1))
+        stats = HourlyStats.objects.get(hour=HourlyStats.truncate(at))
+        self.assertEqual(stats.reviews, 3)
+        self.assertEqual(stats.signups, 0)
+        self.assertEqual(HourlyStats.objects.count(), 2)
+
+    def test_signals(self):
+        user = MyUser.objects.create_user(email='email@email.com', password='fasf3qf3ff')
+        backpack = Backpack.objects.create(profile=user.profile)
+        backpack.save()
+        stats = HourlyStats.objects.get()
+        self.assertEqual((stats.signups, stats.backpacks_created, stats.backpacks_updated), (1, 1, 1))
@@ -94,13 +94,35 @@ class ProductSerializerTestCase(TestCase):
         serializer = self.create_product()
         self.assertCountEqual(serializer.data.keys(),
                               ['id', 'author', 'name', 'full_name', 'brand', 'subcategory', 'url', 'reviews_amount',
-                               'reviews'])
+                               'reviews', 'reviews_next_cursor'])
 
     def test_unique_validator(self):
         self.create_product()
         with self.assertRaises(ValidationError):
             self.create_product()
 
+    def test_with_related_constant_queries(self):
+        for x in range(5):
+            product = Product.objects.create(author=self.user.profile, brand=self.brand, subcategory=self.sub_cat,
+                                             name=f'name{x}')
+            Review.objects.create(author=self.user.profile, product=product, summary='summary', text='text')
+        with self.assertNumQueries(1):
+            data = ProductSerializer(Product.objects.with_related(), many=True,
+                                     fields=['id', 'full_name', 'brand', 'subcategory', 'reviews_amount']).data
+        self.assertEqual([product['reviews_amount'] for product in data], [1] * 5)
+
+    def test_reviews_first_page(self):
+        product = Product.objects.create(author=self.user.profile, brand=self.brand, subcategory=self.sub_cat,
+                                         name='name')
+        for x in range(ProductSerializer.reviews_page_size + 1):
+            user = MyUser.objects.create_user(email=f'email{x}@email.com', password='fasf3qf3ff')
+            Review.objects.create(author=user.profile, product=product, summary=f'summary {x}', text='text')
+        with self.assertNumQueries(2):
+            data = ProductSerializer(Product.objects.with_related().get(id=product.id)).data
+        self.assertEqual(len(data['reviews']), ProductSerializer.reviews_page_size)
+        self.assertEqual(data['reviews'][0]['summary'], f'summary {ProductSerializer.reviews_page_size}')
+        self.assertIsNotNone(data['reviews_next_cursor'])
+
 
 class CategorySerializerTestCase(TestCase):
     def test_contains_expected_fields(self):
@@ -1,14 +1,30 @@
 from django.core import mail
+from django.core.mail.backends import locmem
 from django.contrib.auth.tokens import default_token_generator
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
+from django.utils import timezone
 from django.conf import settings
+from django.test import override_settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+import base64
 import json
-from openpyxl import Workbook
+from openpyxl import Workbook, load_workbook
+import io
 import os
-
-from app.models import MyUser, Profile, Backpack
+from concurrent.futures import Future
+
+from app.models import MyUser, Profile, Backpack, Category, Subcategory, QueuedEmail, ImportJob, HourlyStats, \
+    Brand, Product, Review
+from app.functions.emails import send_queued_emails
+from app.functions.excel_import import scrape_data_from_excel
+from app.functions.stats import STATS_CACHE_KEY
+from app.functions.catalog import get_catalog_version
+from app.functions.import_jobs import claim_import_jobs, run_import_job, requeue_lost_import_jobs, \
+    mark_import_job_failed
 from .drf_tester import DRFTesterCase
+from .fake_lighterpack import FakeLighterpack, read_fixture
 
 
 class ImportFromExcelViewTestCase(DRFTesterCase):
@@ -119,20 +135,119 @@ class ImportFromLpViewTestCase(DRFTesterCase):
 
     def test_invalid_url(self):
         self.login_client(self.user1)
-        response = self.client.post(self.url, {'url': 'https://lighterpack.com/r/badurl'})
-        self.status_check(response, 404)
+        with FakeLighterpack({}) as lighterpack:
+            response = self.client.post(self.url, {'url': lighterpack.url('badurl')})
+            self.status_check(response, 202)
+            for job in claim_import_jobs(10):
+                run_import_job(job)
+        response = self.client.get(f"/api/import_jobs/{response.json()['id']}")
+        self.status_check(response, 200)
+        self.assertEqual(response.json()['status'], ImportJob.FAILED)
 
     def test_valid_request(self):
         self.login_client(self.user1)
-        response = self.client.post(self.url, {'url': 'https://lighterpack.com/r/ttdjjm'})
-        self.status_check(response, 201)
+        with FakeLighterpack({'ttdjjm': read_fixture('lighterpack_list.html')}) as lighterpack:
+            response = self.client.post(self.url, {'url': lighterpack.url('ttdjjm')})
+            self.status_check(response, 202)
+            self.assertEqual(response.json()['status'], ImportJob.QUEUED)
+            for job in claim_import_jobs(10):
+                run_import_job(job)
+        response = self.client.get(f"/api/import_jobs/{response.json()['id']}")
+        self.status_check(response, 200)
+        self.assertEqual(response.json()['status'], ImportJob.DONE)
         new_backpack = Backpack.objects.get(profile=self.user1.profile)
+        self.assertEqual(response.json()['backpack']['id'], new_backpack.id)
         self.assertEqual(new_backpack.name, 'for testing hikegear.pl')
         self.assertEqual(new_backpack.description, 'test description')
 
+    def test_others_job(self):
+        job = ImportJob.objects.create(profile=self.user2.profile, url='https://lighterpack.com/r/ttdjjm')
+        self.login_client(self.user1)
+        response = self.client.get(f'/api/import_jobs/{job.id}')
+        self.status_check(response, 404)
+
+    def test_lost_job_requeued(self):
+        job = ImportJob.objects.create(profile=self.user1.profile, url='https://lighterpack.com/r/ttdjjm')
+        claim_import_jobs(10)
+        old = timezone.now() - timezone.timedelta(hours=1)
+        ImportJob.objects.filter(id=job.id).update(updated=old)
+        self.assertEqual(requeue_lost_import_jobs([job.id]), 0)
+        self.assertEqual(requeue_lost_import_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.QUEUED)
+
+    def test_crashed_job_marked_failed(self):
+        job = ImportJob.objects.create(profile=self.user1.profile, url='https://lighterpack.com/r/ttdjjm')
+        claim_import_jobs(10)
+        future = Future()
+        future.set_exception(RuntimeError('connection lost'))
+        mark_import_job_failed(job.id, future)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ImportJob.FAILED)
+        self.assertIn('connection lost', job.error)
+
         #  TODO: test lpscraper functions and backpack data importing correctly
 
 
+class ImportFromLpCsvViewTestCase(DRFTesterCase):
+    url = '/api/import_from_lp_csv'
+    valid_csv = ('Item Name,Category,desc,qty,weight,unit,url,price,worn,consumable\n'
+                 'tent,Shelter,2 person,1,1.2,kilogram,,0,,\n'
+                 'jacket,Clothing,,1,10,ounce,,0,Worn,\n'
+                 'stakes,Shelter,,4,10,gram,,0,,\n'
+                 'snacks,Food,,2,1,pound,,0,,Consumable\n')
+
+    def post_csv(self, content, **data):
+        return self.client.post(self.url, {'csv': SimpleUploadedFile('my list.csv', content.encode()), **data})
+
+    def test_unauthorized_request(self):
+        response = self.client.post(self.url)
+        self.status_check(response, 403)
+
+    def test_csv_missing(self):
+        self.login_client(self.user1)
+        response = self.client.post(self.url)
+        self.status_check(response, 400)
+
+    def test_valid_request(self):
+        self.login_client(self.user1)
+        response = self.post_csv(self.valid_csv)
+        self.status_check(response, 201)
+        backpack = Backpack.objects.get(profile=self.user1.profile)
+        self.assertEqual(response.json()['id'], backpack.id)
+        self.assertEqual(backpack.name, 'my list')
+        self.assertEqual([category['name'] for category in backpack.list], ['Shelter', 'Clothing', 'Food'])
+        tent, stakes = backpack.list[0]['items']
+        self.assertEqual(tent['weight'], 1200)
+        self.assertEqual(tent['description'], '2 person')
+        self.assertEqual(stakes['quantity'], 4)
+        jacket = backpack.list[1]['items'][0]
+        self.assertAlmostEqual(jacket['weight'], 283.5)
+        self.assertTrue(jacket['worn'])
+        snacks = backpack.list[2]['items'][0]
+        self.assertEqual(snacks['weight'], 453.59)
+        self.assertTrue(snacks['consumable'])
+        self.assertEqual(sorted(item['id'] for category in backpack.list for item in category['items']), [0, 1, 2, 3])
+
+    def test_name_provided(self):
+        self.login_client(self.user1)
+        response = self.post_csv(self.valid_csv, name='trip')
+        self.status_check(response, 201)
+        self.assertEqual(response.json()['name'], 'trip')
+
+    def test_invalid_format(self):
+        self.login_client(self.user1)
+        response = self.post_csv('name,weight\ntent,1200\n')
+        self.status_check(response, 400)
+        response = self.post_csv('Item Name,Category,desc,qty,weight,unit\ntent,Shelter,,1,heavy,gram\n')
+        self.status_check(response, 400)
+
+    def test_no_items_provided(self):
+        self.login_client(self.user1)
+        response = self.post_csv('Item Name,Category,desc,qty,weight,unit,url,price,worn,consumable\n')
+        self.status_check(response, 400)
+
+
 class PrivateGearViewTestCase(DRFTesterCase):
     url = '/api/private_gear'
 
@@ -152,6 +267,210 @@ class PrivateGearViewTestCase(DRFTesterCase):
         self.check_response_fields(response.json(), ['private_gear'])
 
 
+class PrivateGearExportViewTestCase(DRFTesterCase):
+    url = '/api/private_gear/export'
+
+    def test_unauthorized_request(self):
+        response = self.client.get(self.url)
+        self.status_check(response, 403)
+
+    def test_excel_round_trip(self):
+        profile = Profile.objects.get(user=self.user1)
+        profile.private_gear = [{'id': 0, 'name': 'sleep', 'items': [
+            {'id': 0, 'name': 'quilt', 'description': 'warm', 'weight': 600},
+            {'id': 1, 'name': '=formula', 'description': '', 'weight': 20}]}]
+        profile.save()
+        self.login_client(self.user1)
+        response = self.client.get(self.url)
+        self.status_check(response, 200)
+        excel_file = io.BytesIO(b''.join(response.streaming_content))
+        imported = scrape_data_from_excel(excel_file, [])['private_gear']
+        self.assertEqual(imported[1]['name'], 'sleep')
+        self.assertEqual([(item['name'], item['description'], item['weight']) for item in imported[1]['items']],
+                         [('quilt', 'warm', 600), ('=formula', '', 20)])
+
+
+class PrivateGearOperationsViewTestCase(DRFTesterCase):
+    url = '/api/private_gear/operations'
+    private_gear = [{'id': 0, 'name': 'cat0', 'items': [{'id': 0, 'name': 'item0', 'description': '', 'weight': 10}]},
+                    {'id': 1, 'name': 'cat1', 'items': []}]
+
+    def setUp(self):
+        super().setUp()
+        Profile.objects.filter(user=self.user1).update(private_gear=self.private_gear)
+
+    def post(self, operations):
+        self.login_client(self.user1)
+        return self.client.post(self.url, {'operations': operations}, format='json')
+
+    def test_unauthorized_request(self):
+        response = self.client.post(self.url)
+        self.status_check(response, 403)
+
+    def test_operations_missing(self):
+        self.login_client(self.user1)
+        response = self.client.post(self.url)
+        self.status_check(response, 400)
+
+    def test_valid_request(self):
+        response = self.post([{'op': 'add', 'category_id': 1, 'item': {'id': 1, 'name': 'item1', 'weight': 5}},
+                              {'op': 'update', 'item_id': 0, 'value': {'name': 'renamed'}},
+                              {'op': 'move', 'item_id': 0, 'category_id': 1, 'position': 0},
+                              {'op': 'delete', 'category_id': 0}])
+        self.status_check(response, 200)
+        private_gear = Profile.objects.get(user=self.user1).private_gear
+        self.assertEqual(len(private_gear), 1)
+        self.assertEqual([item['id'] for item in private_gear[0]['items']], [0, 1])
+        self.assertEqual(private_gear[0]['items'][0]['name'], 'renamed')
+
+    def test_invalid_request(self):
+        response = self.post([{'op': 'add', 'category_id': 1, 'item': {'id': 0, 'name': 'duplicated id'}}])
+        self.status_check(response, 400)
+        response = self.post([{'op': 'update', 'item_id': 0, 'value': {'name': 'x' * 100}}])
+        self.status_check(response, 400)
+        for operation in [{'op': 'add', 'category': 'cat'}, {'op': 'add', 'category_id': 1, 'item': [1]},
+                          {'op': 'delete', 'category_id': [0]}, {'op': 'delete', 'item_id': {'id': 0}},
+                          {'op': 'move', 'item_id': 0, 'category_id': 'x'}, {'op': 'update', 'item_id': 0, 'value': 1},
+                          {'op': 'rename', 'category_id': 0}, {'op': 'add'},
+                          {'op': 'move', 'category_id': 0, 'position': -1}]:
+            response = self.post([operation])
+            self.status_check(response, 400)
+        self.assertEqual(Profile.objects.get(user=self.user1).private_gear, self.private_gear)
+
+    def test_only_validated_fields_are_stored(self):
+        response = self.post([{'op': 'add', 'category': {'id': 2, 'name': 'cat2', 'extra': 'x' * 1000,
+                                                          'items': [{'id': 1, 'name': 'item1', 'extra': 1}]}},
+                              {'op': 'add', 'category_id': 1, 'item': {'id': 2, 'name': 'item2', 'extra': 1}}])
+        self.status_check(response, 200)
+        private_gear = Profile.objects.get(user=self.user1).private_gear
+        self.assertEqual(private_gear[1]['items'], [{'id': 2, 'name': 'item2'}])
+        self.assertEqual(private_gear[2], {'id': 2, 'name': 'cat2', 'items': [{'id': 1, 'name': 'item1'}]})
+
+
+class ProductViewSetReviewsTestCase(DRFTesterCase):
+    url = '/api/products'
+
+    @classmethod
+    def moreSetUpTestTestData(cls):
+        category = Category.objects.create(name='category')
+        subcategory = Subcategory.objects.create(category=category, name='subcategory')
+        brand = Brand.objects.create(name='brand')
+        cls.product = Product.objects.create(author=cls.user1.profile, brand=brand, subcategory=subcategory, name='n')
+        for x in range(25):
+            user = MyUser.objects.create_user(email=f'reviewer{x}@email.com', password='fasf3qf3ff')
+            Review.objects.create(author=user.profile, product=cls.product, summary=f'summary {x}', text='text')
+
+    def test_unauthorized_request(self):
+        response = self.client.get(f'{self.url}/{self.product.id}/reviews')
+        self.status_check(response, 403)
+
+    def test_retrieve_first_page(self):
+        self.login_client(self.user1)
+        response = self.client.get(f'{self.url}/{self.product.id}')
+        self.status_check(response, 200)
+        self.assertEqual(response.json()['reviews_amount'], 25)
+        self.assertEqual(len(response.json()['reviews']), 10)
+        self.assertEqual(response.json()['reviews'][0]['summary'], 'summary 24')
+
+    def test_reviews_pages(self):
+        self.login_client(self.user1)
+        response = self.client.get(f'{self.url}/{self.product.id}')
+        summaries = [review['summary'] for review in response.json()['reviews']]
+        cursor = response.json()['reviews_next_cursor']
+        while cursor:
+            response = self.client.get(f'{self.url}/{self.product.id}/reviews', {'cursor': cursor, 'page_size': 7})
+            self.status_check(response, 200)
+            summaries += [review['summary'] for review in response.json()['results']]
+            cursor = response.json()['next_cursor']
+        self.assertEqual(summaries, [f'summary {x}' for x in reversed(range(25))])
+
+    def test_invalid_requests(self):
+        self.login_client(self.user1)
+        response = self.client.get(f'{self.url}/{self.product.id + 1}/reviews')
+        self.status_check(response, 404)
+        response = self.client.get(f'{self.url}/{self.product.id}/reviews', {'cursor': 'abc'})
+        self.status_check(response, 400)
+
+
+class SearchForProductViewTestCase(DRFTesterCase):
+    url = '/api/search_for_product'
+
+    @classmethod
+    def moreSetUpTestTestData(cls):
+        cls.tent = Subcategory.objects.create(category=Category.objects.create(name='namioty'), name='namiot')
+        down = Subcategory.objects.create(category=Category.objects.create(name='śpiwory'), name='puchowe')
+        cls.msr = Brand.objects.create(name='MSR')
+        cumulus = Brand.objects.create(name='Cumulus')
+        profile = cls.user1.profile
+        cls.hubba = Product.objects.create(author=profile, brand=cls.msr, subcategory=cls.tent, name='Hubba Hubba NX')
+        cls.elixir = Product.objects.create(author=profile, brand=cls.msr, subcategory=cls.tent, name='Elixir 2')
+        cls.panyam = Product.objects.create(author=profile, brand=cumulus, subcategory=down, name='Panyam 450')
+
+    def search(self, query, **params):
+        response = self.client.get(self.url, {'query': query, **params})
+        self.status_check(response, 200)
+        return response.json()
+
+    def test_unauthorized_request(self):
+        response = self.client.get(self.url, {'query': 'namiot'})
+        self.status_check(response, 403)
+
+    def test_query_missing(self):
+        self.login_client(self.user1)
+        response = self.client.get(self.url)
+        self.status_check(response, 400)
+
+    def test_invalid_pagination_params(self):
+        self.login_client(self.user1)
+        self.status_check(self.client.get(self.url, {'query': 'namiot', 'page_size': 'all'}), 400)
+        self.status_check(self.client.get(self.url, {'query': 'namiot', 'cursor': 'invalid'}), 400)
+        for values in [['a', 1], [0.5, 'b'], [0.5, 1.5], [True, 1], [0.5], {}]:
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+            self.status_check(self.client.get(self.url, {'query': 'namiot', 'cursor': cursor}), 400)
+
+    def test_full_name_match(self):
+        self.login_client(self.user1)
+        results = self.search('namiot MSR Hubba')['results']
+        self.assertEqual(results[0]['id'], self.hubba.id)
+        self.assertEqual(results[0]['full_name'], 'namiot MSR Hubba Hubba NX')
+        self.assertNotIn(self.panyam.id, [product['id'] for product in results])
+        self.assertEqual(self.search('puchowe Cumulus Panyam')['results'][0]['id'], self.panyam.id)
+
+    def test_short_partial_query(self):
+        # similarity of a short query to a long full name is low, "hub" scores about 0.08 here
+        product = Product.objects.create(author=self.user1.profile, brand=self.msr, subcategory=self.tent,
+                                         name='Hubba Hubba NX 2 Ultralight Green')
+        self.login_client(self.user1)
+        self.assertIn(product.id, [product['id'] for product in self.search('hub')['results']])
+
+    def test_ranking(self):
+        self.login_client(self.user1)
+        ids = [product['id'] for product in self.search('namiot MSR Elixir 2')['results']]
+        self.assertEqual(ids[:2], [self.elixir.id, self.hubba.id])
+        ids = [product['id'] for product in self.search('MSR Hubba', brand_id=self.msr.id)['results']]
+        self.assertEqual(ids[0], self.hubba.id)
+
+    def test_pages_with_tied_similarity(self):
+        # v0..v9 and v10..v44 have equal similarity to the query, ties are ordered by id across pages
+        tied = {Product.objects.create(author=self.user1.profile, brand=self.msr, subcategory=self.tent,
+                                       name=f'Hubba v{x}').id for x in range(45)}
+        self.login_client(self.user1)
+        single_page = self.search('namiot MSR Hubba', page_size=50)
+        self.assertFalse(single_page['has_more'])
+        ids, cursor = [], None
+        while True:
+            page = self.search('namiot MSR Hubba', page_size=7, **({'cursor': cursor} if cursor else {}))
+            self.assertLessEqual(len(page['results']), 7)
+            ids += [product['id'] for product in page['results']]
+            self.assertEqual(page['has_more'], page['next_cursor'] is not None)
+            if not page['has_more']:
+                break
+            cursor = page['next_cursor']
+        self.assertEqual(ids, [product['id'] for product in single_page['results']])
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertTrue(tied <= set(ids))
+
+
 class InitialViewTestCase(DRFTesterCase):
     url = '/api/initial'
     response_fields = ['backpacks', 'private_gear', 'categories', 'brands', 'user_id']
@@ -166,6 +485,38 @@ class InitialViewTestCase(DRFTesterCase):
         self.status_check(response, 200)
         self.check_response_fields(response.json())
 
+    def test_not_modified(self):
+        self.login_client(self.user1)
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.status_check(response, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_etag_changes_after_backpack_update(self):
+        self.login_client(self.user1)
+        etag = self.client.get(self.url)['ETag']
+        Backpack.objects.create(profile=self.user1.profile)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.status_check(response, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_catalog_cache_invalidated_on_write(self):
+        self.login_client(self.user1)
+        self.client.get(self.url)
+        with self.run_on_commit_callbacks():
+            category = Category.objects.create(name='new category')
+            Subcategory.objects.create(category=category, name='new subcategory')
+        categories = self.client.get(self.url).json()['categories']
+        self.assertEqual(categories[-1]['name'], 'new category')
+        self.assertEqual(categories[-1]['subcategories'][0]['name'], 'new subcategory')
+
+    def test_catalog_version_bumped_after_commit(self):
+        version = get_catalog_version()
+        with self.run_on_commit_callbacks():
+            Brand.objects.create(name='new brand')
+            self.assertEqual(get_catalog_version(), version)  # not committed yet
+        self.assertNotEqual(get_catalog_version(), version)
+
 
 class BackPackViewSetTestCase(DRFTesterCase):
     url = '/api/backpacks'
@@ -244,6 +595,66 @@ class BackPackViewSetTestCase(DRFTesterCase):
         request = self.client.patch(self.url + '/' + str(backpack.id), self.data, format='json')
         self.status_check(request, 403)
 
+    def test_list_patch_request(self):
+        backpack = Backpack.objects.create(profile=self.user1.profile, list=[{'id': 0, 'name': 'cat', 'items': []}])
+        self.login_client(self.user1)
+        updated = self.client.get(self.url + '/' + str(backpack.id)).json()['updated']
+        list_patch = [{'op': 'add', 'path': '/0/items/-', 'value': {'id': 0, 'name': 'item'}},
+                      {'op': 'replace', 'path': '/0/name', 'value': 'new cat'}]
+        request = self.client.patch(self.url + '/' + str(backpack.id),
+                                    {'list_patch': list_patch, 'base_updated': updated}, format='json')
+        self.status_check(request, 200)
+        self.assertEqual(Backpack.objects.get(id=backpack.id).list,
+                         [{'id': 0, 'name': 'new cat', 'items': [{'id': 0, 'name': 'item'}]}])
+        request = self.client.patch(self.url + '/' + str(backpack.id),
+                                    {'list_patch': list_patch, 'base_updated': updated}, format='json')
+        self.status_check(request, 409)
+
+    def test_invalid_list_patch_request(self):
+        backpack = Backpack.objects.create(profile=self.user1.profile)
+        self.login_client(self.user1)
+        request = self.client.patch(self.url + '/' + str(backpack.id),
+                                    {'list_patch': [{'op': 'remove', 'path': '/3'}]}, format='json')
+        self.status_check(request, 400)
+        request = self.client.patch(self.url + '/' + str(backpack.id),
+                                    {'list_patch': [], 'name': 'new name'}, format='json')
+        self.status_check(request, 400)
+        self.assertEqual(Backpack.objects.get(id=backpack.id).name, '')
+
+    def test_summaries_request(self):
+        Backpack.objects.create(profile=self.user1.profile, list=[{'id': 0, 'name': 'cat', 'items': [{'weight': 5}]}])
+        Backpack.objects.create(profile=self.user2.profile)
+        self.login_client(self.user1)
+        request = self.client.get(self.url + '/summaries')
+        self.status_check(request, 200)
+        json = request.json()
+        self.assertEqual(len(json), 1)
+        self.assertNotIn('list', json[0])
+        self.assertEqual(json[0]['summary']['total_weight'], 5)
+
+    def test_export_request(self):
+        backpack = Backpack.objects.create(profile=self.user1.profile, list=[
+            {'id': 0, 'name': 'cat', 'items': [{'id': 0, 'name': 'tent', 'description': 'x', 'weight': 1200.0}]}])
+        self.login_client(self.user1)
+        response = self.client.get(self.url + '/' + str(backpack.id) + '/export', {'extension': 'csv'})
+        self.status_check(response, 200)
+        self.assertEqual(b''.join(response.streaming_content).decode(), 'kategoria,cat,\r\ntent,x,1200\r\n')
+        response = self.client.get(self.url + '/' + str(backpack.id) + '/export', {'extension': 'pdf'})
+        self.status_check(response, 400)
+        self.login_client(self.user2)
+        response = self.client.get(self.url + '/' + str(backpack.id) + '/export')
+        self.status_check(response, 403)
+
+    def test_export_all_request(self):
+        Backpack.objects.create(profile=self.user1.profile, name='first', list=[{'id': 0, 'name': 'cat', 'items': []}])
+        Backpack.objects.create(profile=self.user1.profile, name='second', list=[{'id': 0, 'name': 'cat', 'items': []}])
+        Backpack.objects.create(profile=self.user2.profile, name='other', list=[{'id': 0, 'name': 'cat', 'items': []}])
+        self.login_client(self.user1)
+        response = self.client.get(self.url + '/export')
+        self.status_check(response, 200)
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([row[1] for row in sheet.iter_rows(values_only=True)], ['first / cat', 'second / cat'])
+
     def test_unauthorized_valid_delete_request(self):
         backpack = Backpack.objects.create(profile=self.user1.profile)
         request = self.client.delete(self.url + '/' + str(backpack.id))
@@ -263,6 +674,54 @@ class BackPackViewSetTestCase(DRFTesterCase):
         self.status_check(request, 403)
 
 
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class StatsViewTestCase(DRFTesterCase):
+    url = '/stats'  # query counts below are of stats only, cache backend is in memory
+
+    def setUp(self):
+        super().setUp()
+        cache.delete(STATS_CACHE_KEY)
+
+    def test_counts(self):
+        Backpack.objects.create(profile=self.user1.profile)
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        self.status_check(response, 200)
+        self.assertEqual(response.context['users'], {'all': 2, 'last24h': 2, 'last1h': 2, 'last10min': 2})
+        self.assertEqual(response.context['backpacks']['all'], 1)
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+
+class HourlyStatsViewTestCase(DRFTesterCase):
+    url = '/api/stats'
+
+    def test_not_admin_request(self):
+        self.login_client(self.user1)
+        response = self.client.get(self.url)
+        self.status_check(response, 403)
+
+    def test_range(self):
+        admin = MyUser.objects.create_superuser(email='admin@email.com', password='fasf3qf3ff')
+        day = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0) - timezone.timedelta(days=3)
+        HourlyStats.objects.all().delete()
+        HourlyStats.increment('signups', 2, at=day)
+        HourlyStats.increment('signups', at=day + timezone.timedelta(hours=1))
+        HourlyStats.increment('reviews', at=day + timezone.timedelta(days=1))
+        self.login_client(admin)
+        params = {'start': day.isoformat(), 'end': (day + timezone.timedelta(days=2)).isoformat()}
+        with self.assertNumQueries(3):  # session, user, rollup rows
+            response = self.client.get(self.url, params)
+        self.status_check(response, 200)
+        self.assertEqual(len(response.json()['buckets']), 3)
+        self.assertEqual(response.json()['totals']['signups'], 3)
+        self.assertEqual(response.json()['totals']['reviews'], 1)
+        response = self.client.get(self.url, {**params, 'bucket': 'day'})
+        self.assertEqual([row['signups'] for row in response.json()['buckets']], [3, 0])
+        response = self.client.get(self.url, {'start': params['end'], 'end': params['start']})
+        self.status_check(response, 400)
+
+
 class TestUserViewSetResetPasswordAction(DRFTesterCase):
     url = '/api/users/reset_password'
 
@@ -305,6 +764,30 @@ class TestUserViewSetResetPasswordAction(DRFTesterCase):
         self.assertTrue(response.cookies['sessionid'])
 
 
+class OpenCountingEmailBackend(locmem.EmailBackend):
+    opened = 0
+
+    def open(self):
+        type(self).opened += 1
+        return super().open()
+
+
+class UnreachableEmailBackend(locmem.EmailBackend):
+    def open(self):
+        raise OSError('connection refused')
+
+
+class DroppingEmailBackend(OpenCountingEmailBackend):
+    """first message fails as if the server dropped connection"""
+    dropped = False
+
+    def send_messages(self, messages):
+        if not type(self).dropped:
+            type(self).dropped = True
+            raise OSError('connection dropped')
+        return super().send_messages(messages)
+
+
 class TestUserViewSetResetPasswordStartAction(DRFTesterCase):
     url = '/api/users/reset_password_start'
 
@@ -315,19 +798,52 @@ class TestUserViewSetResetPasswordStartAction(DRFTesterCase):
     def test_nonexistent_user(self):
         response = self.client.post(self.url, {'email': 'nonexistent@email.com'})
         self.status_check(response, 200)
-        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(QueuedEmail.objects.exists())
 
     def test_valid_request(self):
         response = self.client.post(self.url, {'email': self.user1data['email']})
         self.status_check(response, 200)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(send_queued_emails(), (1, 0))
         self.assertEqual(len(mail.outbox), 1)
 
+    @override_settings(EMAIL_BACKEND='app.tests.test_views.OpenCountingEmailBackend')
+    def test_connection_opened_only_for_due_emails(self):
+        OpenCountingEmailBackend.opened = 0
+        self.assertEqual(send_queued_emails(), (0, 0))
+        self.assertEqual(OpenCountingEmailBackend.opened, 0)
+        self.client.post(self.url, {'email': self.user1data['email']})
+        self.client.post(self.url, {'email': self.user1data['email']})
+        self.assertEqual(send_queued_emails(batch_size=1), (2, 0))
+        self.assertEqual(OpenCountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 2)
+
+    @override_settings(EMAIL_BACKEND='app.tests.test_views.UnreachableEmailBackend')
+    def test_connection_error(self):
+        self.client.post(self.url, {'email': self.user1data['email']})
+        self.assertEqual(send_queued_emails(), (0, 1))
+        email = QueuedEmail.objects.get()
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt, timezone.now())
+        self.assertIn('connection refused', email.last_error)
+        self.assertEqual(send_queued_emails(), (0, 0))  # not due yet
+
+    @override_settings(EMAIL_BACKEND='app.tests.test_views.DroppingEmailBackend')
+    def test_reconnect_after_failed_send(self):
+        DroppingEmailBackend.opened = 0
+        DroppingEmailBackend.dropped = False
+        for x in range(3):
+            self.client.post(self.url, {'email': self.user1data['email']})
+        self.assertEqual(send_queued_emails(), (2, 1))
+        self.assertEqual(DroppingEmailBackend.opened, 2)
+        self.assertEqual(len(mail.outbox), 2)
+
     def test_inactive_user(self):
         self.user1.is_active = False
         self.user1.save()
         response = self.client.post(self.url, {'email': self.user1data['email']})
         self.status_check(response, 200)
-        self.assertEqual(len(mail.outbox), 0)
+        self.assertFalse(QueuedEmail.objects.exists())
 
 
 class TestUserViewSetChangePasswordAction(DRFTesterCase):
@@ -384,7 +900,10 @@ class TestUserViewSetCreateAction(DRFTesterCase):
         self.check_response_fields(json)
         self.assertTrue(MyUser.objects.get(**json).check_password(self.new_user_data['password']))
         self.assertTrue(Profile.objects.get(user_id=json['id']))
+        self.assertEqual(QueuedEmail.objects.filter(recipients=[self.new_user_data['email']]).count(), 1)
+        send_queued_emails()
         self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, [self.new_user_data['email']])
 
     def test_post_method_data_missing(self):
         response = self.client.post(self.url)
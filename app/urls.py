@@ -2,7 +2,8 @@ from django.urls import path
 from rest_framework.routers import SimpleRouter
 from .views import UserViewSet, BackpackViewSet, InitialView, LoginView, LogoutView, PrivateGearView, \
     ImportFromLpView, ImportFromHgView, ImportFromExcelView, SearchForProductView, ProductViewSet, ReviewViewSet, \
-    BrandViewSet
+    BrandViewSet, PrivateGearOperationsView, ImportJobView, \
+    ImportFromLpCsvView, PrivateGearExportView, HourlyStatsView
 
 router = SimpleRouter(trailing_slash=False)
 router.register(r'users', UserViewSet)
@@ -16,9 +17,14 @@ urlpatterns = [
     path('login', LoginView.as_view(), name='login_view'),
     path('logout', LogoutView.as_view(), name='logout_view'),
     path('private_gear', PrivateGearView.as_view(), name='private_gear'),
+    path('private_gear/operations', PrivateGearOperationsView.as_view(), name='private_gear_operations'),
+    path('private_gear/export', PrivateGearExportView.as_view(), name='private_gear_export'),
     path('import_from_lp', ImportFromLpView.as_view(), name='import_from_lp'),
+    path('import_from_lp_csv', ImportFromLpCsvView.as_view(), name='import_from_lp_csv'),
+    path('import_jobs/<int:job_id>', ImportJobView.as_view(), name='import_job'),
     path('import_from_hg', ImportFromHgView.as_view(), name='import_from_hg'),
     path('import_from_excel', ImportFromExcelView.as_view(), name='import_from_excel'),
+    path('stats', HourlyStatsView.as_view(), name='hourly_stats'),
     path('search_for_product', SearchForProductView.as_view(), name='search_for_product'),
 ]
 urlpatterns += router.urls
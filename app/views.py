@@ -2,26 +2,39 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.password_validation import validate_password
 from django.contrib.postgres.search import TrigramSimilarity
 from django.core.exceptions import ValidationError as DjangoValidationError, ObjectDoesNotExist
+from django.db import connection, transaction
+from django.db.models import Q, FloatField
+from django.db.models.functions import Cast
 from django.shortcuts import redirect, render
 from django.utils import timezone
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.decorators import action
 from rest_framework.exceptions import NotFound, ValidationError, PermissionDenied
 from rest_framework.mixins import DestroyModelMixin, CreateModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet
 
-from .models import MyUser, Backpack, Category, Brand, Product, Review
+from .models import MyUser, Profile, Backpack, Brand, Product, Review, ImportJob, HourlyStats
 from .permissions import IsAuthenticatedOrPostOnly, BackpackPermission, IsAuthor
-from .serializers import UserSerializer, BackpackSerializer, PrivateGearSerializer, \
-    CategorySerializer, BrandSerializer, ProductSerializer, ReviewSerializer
+from .serializers import UserSerializer, BackpackSerializer, PrivateGearSerializer, BrandSerializer, \
+    ProductSerializer, ReviewSerializer, BackpackSummarySerializer, ImportJobSerializer
 from .functions.emails import send_account_activation_email, send_password_reset_email, force_text, \
     default_token_generator, urlsafe_base64_decode
-from .functions.lpscraper import import_backpack_from_lp
 from .functions.excel_import import scrape_data_from_excel
+from .functions.lp_csv import import_backpack_from_lp_csv
+from .functions.gear_export import export_response, gear_rows, backpacks_rows
+from .functions.etags import initial_view_etag, etag_matches
+from .functions.catalog import get_catalog_version
+from .functions.catalog_cache import get_catalog
+from .functions.json_patch import apply_patch, JsonPatchError
+from .functions.private_gear import apply_gear_operations
+from .functions.backpack_summary import summarize_backpack_list
+from .functions.stats import get_stats
+from .functions.hourly_stats import read_hourly_stats, HOURLY_STATS_MAX_RANGE
+from .functions.pagination import decode_cursor, get_page_size, keyset_page, newest_first_page
 from hikegear_backend.settings import FRONTEND_URL, PASSWORD_RESET_TIMEOUT
 
 
@@ -38,19 +51,38 @@ class ReviewViewSet(GenericViewSet, CreateModelMixin, UpdateModelMixin, DestroyM
 
 
 class ProductViewSet(GenericViewSet, CreateModelMixin, UpdateModelMixin, RetrieveModelMixin):
-    queryset = Product.objects.all()
+    queryset = Product.objects.with_related()
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
+    reviews_max_page_size = 50
 
+    @action(detail=True, methods=['get'])
+    def reviews(self, request, pk=None):
+        try:
+            product = Product.objects.only('id').get(pk=pk)
+        except (Product.DoesNotExist, ValueError):
+            raise NotFound
+        page_size = get_page_size(request, ProductSerializer.reviews_page_size, self.reviews_max_page_size)
+        reviews, has_more, next_cursor = newest_first_page(product.reviews.all(), page_size,
+                                                           request.query_params.get('cursor'))
+        return Response({
+            'results': ReviewSerializer(reviews, many=True).data,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+        })
 
-class SearchForProductView(APIView):  # TODO: write tests for this view
+
+class SearchForProductView(APIView):
     permission_classes = [IsAuthenticated]
+    similarity_threshold = 0.06  # search_name is long (subcategory, brand and name), short queries score low
+    default_page_size = 20
+    max_page_size = 50
 
-    @staticmethod
-    def get(request):
+    @classmethod
+    def get(cls, request):
         requested_query = request.query_params.get('query')
         if requested_query is not None:
-            products = Product.objects.all()
+            products = Product.objects.with_related()
             subcategory_id = request.query_params.get('subcategory_id')
             category_id = request.query_params.get('category_id')
             if subcategory_id:
@@ -60,10 +92,33 @@ class SearchForProductView(APIView):  # TODO: write tests for this view
             brand_id = request.query_params.get('brand_id')
             if brand_id:
                 products = products.filter(brand=brand_id)
-            results_by_name = products.annotate(similarity=TrigramSimilarity('name', requested_query)).filter(
-                similarity__gt=0.06).order_by('-similarity')
-            return Response(ProductSerializer(results_by_name, many=True, fields=(
-                'id', 'full_name', 'brand', 'subcategory', 'reviews_amount')).data)
+            # trigram_similar uses pg_trgm "%" operator, so the search can use product_search_name_trgm index,
+            # similarity is real, cast to double precision so the value stored in cursor compares equal to itself
+            results = products.filter(search_name__trigram_similar=requested_query).annotate(
+                similarity=Cast(TrigramSimilarity('search_name', requested_query), FloatField())
+            ).order_by('-similarity', 'id')
+            cursor = request.query_params.get('cursor')
+            if cursor:
+                try:
+                    last_similarity, last_id = decode_cursor(cursor)
+                except ValueError:
+                    raise ValidationError({'cursor': 'invalid cursor'})
+                if not isinstance(last_similarity, (int, float)) or isinstance(last_similarity, bool) \
+                        or not isinstance(last_id, int) or isinstance(last_id, bool):
+                    raise ValidationError({'cursor': 'invalid cursor'})
+                results = results.filter(Q(similarity__lt=last_similarity) | Q(similarity=last_similarity,
+                                                                               id__gt=last_id))
+            page_size = get_page_size(request, cls.default_page_size, cls.max_page_size)
+            with transaction.atomic(), connection.cursor() as db_cursor:
+                db_cursor.execute('SET LOCAL pg_trgm.similarity_threshold = %s', [cls.similarity_threshold])
+                products, has_more, next_cursor = keyset_page(results, page_size,
+                                                              lambda product: [product.similarity, product.id])
+            return Response({
+                'results': ProductSerializer(products, many=True, fields=(
+                    'id', 'full_name', 'brand', 'subcategory', 'reviews_amount')).data,
+                'has_more': has_more,
+                'next_cursor': next_cursor,
+            })
         else:
             raise ValidationError({'query': 'you must provide "query" to search for'})
 
@@ -81,7 +136,9 @@ class ImportFromExcelView(APIView):
         data = scrape_data_from_excel(excel_file, request.user.profile.private_gear)
         serializer = PrivateGearSerializer(request.user.profile, data=data)
         serializer.is_valid(raise_exception=True)
-        return Response(PrivateGearSerializer(serializer.save()).data)
+        profile = serializer.save()
+        HourlyStats.increment('imports_excel')
+        return Response(PrivateGearSerializer(profile).data)
 
 
 class ImportFromHgView(APIView):
@@ -101,6 +158,7 @@ class ImportFromHgView(APIView):
             raise PermissionDenied('this backpack is not shared')
         new_backpack = Backpack.objects.create(profile=request.user.profile, name=backpack.name,
                                                description=backpack.description, list=backpack.list)
+        HourlyStats.increment('imports_hg')
         serializer = BackpackSerializer(new_backpack, context={'request': request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
@@ -114,14 +172,44 @@ class ImportFromLpView(APIView):
             url = request.data['url']
         except KeyError:
             raise ValidationError({'url': "you must provide 'url' of lighterpack backpack"})
-        json_data = import_backpack_from_lp(url)
-        if not json_data:
-            raise NotFound
-        json_data['profile'] = request.user.profile
-        serializer = BackpackSerializer(data=json_data)
+        # fetching lighterpack.com is slow, run_import_jobs command does it outside of request
+        job = ImportJob(profile=request.user.profile, source=ImportJob.LIGHTERPACK, url=url)
+        try:
+            job.full_clean(exclude=['profile', 'backpack'])
+        except DjangoValidationError as err:
+            raise ValidationError(err.message_dict)
+        job.save()
+        return Response(ImportJobSerializer(job, context={'request': request}).data, status=status.HTTP_202_ACCEPTED)
+
+
+class ImportFromLpCsvView(APIView):
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    @staticmethod
+    def post(request):
+        try:
+            csv_file = request.data['csv']
+        except KeyError:
+            raise ValidationError({'csv': "you must provide 'csv' file exported from lighterpack in request data"})
+        json_data = import_backpack_from_lp_csv(csv_file, request.data.get('name'))
+        serializer = BackpackSerializer(data=json_data, context={'request': request})
         serializer.is_valid(raise_exception=True)
-        return Response(BackpackSerializer(serializer.save(), context={'request': request}).data,
-                        status=status.HTTP_201_CREATED)
+        serializer.save()
+        HourlyStats.increment('imports_lp_csv')
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ImportJobView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def get(request, job_id):
+        try:
+            job = ImportJob.objects.select_related('backpack').get(id=job_id, profile=request.user.profile)
+        except ImportJob.DoesNotExist:
+            raise NotFound
+        return Response(ImportJobSerializer(job, context={'request': request}).data)
 
 
 class PrivateGearView(APIView):
@@ -134,20 +222,48 @@ class PrivateGearView(APIView):
         return Response(PrivateGearSerializer(serializer.save()).data)
 
 
+class PrivateGearExportView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def get(request):
+        return export_response(request, gear_rows(request.user.profile.private_gear), 'private_gear')
+
+
+class PrivateGearOperationsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def post(request):
+        try:
+            operations = request.data['operations']
+        except KeyError:
+            raise ValidationError({'operations': "you must provide list of 'operations'"})
+        with transaction.atomic():
+            profile = Profile.objects.select_for_update().get(pk=request.user.profile.pk)
+            apply_gear_operations(profile.private_gear, operations)
+            profile.save(update_fields=['private_gear', 'updated'])
+        return Response()
+
+
 class InitialView(APIView):
     permission_classes = [IsAuthenticated]
 
     @staticmethod
     def get(request):
+        catalog_version = get_catalog_version()  # read once, every cache read may be a database query
+        etag = initial_view_etag(request.user.profile, catalog_version)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
         backpacks = Backpack.objects.filter(profile=request.user.profile).order_by('-updated')
         backpacks_serializer = BackpackSerializer(backpacks, many=True, context={'request': request})
         private_gear_serializer = PrivateGearSerializer(request.user.profile)
         response = private_gear_serializer.data
         response['backpacks'] = backpacks_serializer.data
-        response['categories'] = CategorySerializer(Category.objects.all(), many=True).data
-        response['brands'] = BrandSerializer(Brand.objects.all().order_by('name'), many=True).data
+        response.update(get_catalog(catalog_version))
         response['user_id'] = request.user.id
-        return Response(response)
+        return Response(response, headers=headers)
 
 
 class BackpackViewSet(GenericViewSet, DestroyModelMixin, RetrieveModelMixin, CreateModelMixin, UpdateModelMixin):
@@ -156,6 +272,52 @@ class BackpackViewSet(GenericViewSet, DestroyModelMixin, RetrieveModelMixin, Cre
     serializer_class = BackpackSerializer
     http_method_names = ['get', 'post', 'delete', 'patch']
 
+    def partial_update(self, request, *args, **kwargs):
+        if 'list_patch' not in request.data:
+            return super().partial_update(request, *args, **kwargs)
+        other_fields = set(request.data) - {'list_patch', 'base_updated'}
+        if other_fields:
+            raise ValidationError({'list_patch': f"can not be sent together with: {', '.join(sorted(other_fields))}"})
+        backpack = self.get_object()
+        updated_field = serializers.DateTimeField()
+        base_updated = request.data.get('base_updated')
+        if base_updated is not None:
+            try:
+                base_updated = updated_field.to_internal_value(base_updated)
+            except ValidationError as err:
+                raise ValidationError({'base_updated': err.detail})
+            if base_updated != backpack.updated:
+                return Response({'info': 'backpack was modified since base revision',
+                                 'updated': updated_field.to_representation(backpack.updated)},
+                                status=status.HTTP_409_CONFLICT)
+        try:
+            new_list = apply_patch(backpack.list, request.data['list_patch'])
+        except JsonPatchError as err:
+            raise ValidationError({'list_patch': str(err)})
+        now = timezone.now()
+        # compare-and-swap on updated, so concurrent autosaves can not overwrite each other
+        saved = Backpack.objects.filter(id=backpack.id, updated=backpack.updated).update(
+            list=new_list, summary=summarize_backpack_list(new_list), updated=now)
+        if not saved:
+            return Response({'info': 'backpack was modified since base revision'}, status=status.HTTP_409_CONFLICT)
+        HourlyStats.increment('backpacks_updated')  # queryset update does not send post_save
+        return Response({'id': backpack.id, 'updated': updated_field.to_representation(now)})
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def summaries(self, request):
+        backpacks = Backpack.objects.filter(profile=request.user.profile).defer('list').order_by('-updated')
+        return Response(BackpackSummarySerializer(backpacks, many=True, context={'request': request}).data)
+
+    @action(detail=True, methods=['get'])
+    def export(self, request, pk=None):
+        backpack = self.get_object()
+        return export_response(request, gear_rows(backpack.list), f'backpack-{backpack.id}')
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='export')
+    def export_all(self, request):
+        backpacks = Backpack.objects.filter(profile=request.user.profile).only('name', 'list').order_by('created')
+        return export_response(request, backpacks_rows(backpacks.iterator(chunk_size=10)), 'backpacks')
+
 
 class UserViewSet(GenericViewSet):
     permission_classes = [IsAuthenticatedOrPostOnly]
@@ -174,8 +336,9 @@ class UserViewSet(GenericViewSet):
             pass
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        user = serializer.save()
-        send_account_activation_email(request, user)
+        with transaction.atomic():
+            user = serializer.save()
+            send_account_activation_email(request, user)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     @action(detail=False, methods=['patch'])
@@ -281,29 +444,32 @@ class LogoutView(APIView):
         return Response({'info': 'Your are logged out'})
 
 
+class HourlyStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @staticmethod
+    def get(request):
+        time_field = serializers.DateTimeField()
+        try:
+            end = time_field.to_internal_value(request.query_params.get('end', timezone.now()))
+            start = time_field.to_internal_value(request.query_params.get('start', end - timezone.timedelta(days=1)))
+        except ValidationError as err:
+            raise ValidationError({'start/end': err.detail})
+        bucket = request.query_params.get('bucket', 'hour')
+        if bucket not in ('hour', 'day'):
+            raise ValidationError({'bucket': "bucket must be 'hour' or 'day'"})
+        if not start < end <= start + HOURLY_STATS_MAX_RANGE:
+            raise ValidationError({'start/end': 'start must be before end, range can not be longer than 366 days'})
+        buckets, totals = read_hourly_stats(start, end, bucket)
+        for row in buckets:
+            row['time'] = time_field.to_representation(row['time'])
+        return Response({'start': time_field.to_representation(start), 'end': time_field.to_representation(end),
+                         'bucket': bucket, 'totals': totals, 'buckets': buckets})
+
+
 def page_not_found_view(request, exception):
     return redirect(FRONTEND_URL + 'not_found')
 
 
 def stats_view(request):
-    users = MyUser.objects.all()
-    backpacks = Backpack.objects.all()
-    time_threshold24 = timezone.now() - timezone.timedelta(hours=24)
-    time_threshold1 = timezone.now() - timezone.timedelta(hours=1)
-    time_threshold10 = timezone.now() - timezone.timedelta(minutes=10)
-    context = {
-        'users': {
-            'all': len(users),
-            'last24h': len(users.filter(date_joined__gt=time_threshold24)),
-            'last1h': len(users.filter(date_joined__gt=time_threshold1)),
-            'last10min': len(users.filter(date_joined__gt=time_threshold10)),
-        },
-        'backpacks': {
-            'all': len(backpacks),
-            'last24h': len(backpacks.filter(created__gt=time_threshold24)),
-            'last1h': len(backpacks.filter(created__gt=time_threshold1)),
-            'last10min': len(backpacks.filter(created__gt=time_threshold10)),
-        },
-    }
-
-    return render(request, 'stats.html', context)
+    return render(request, 'stats.html', get_stats())
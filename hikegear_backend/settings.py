@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'app',
     'rest_framework',
     'corsheaders',
@@ -120,6 +121,31 @@ DEFAULT_FROM_EMAIL = 'hikegear.pl <noreply@hikegear.pl>'
 
 PASSWORD_RESET_TIMEOUT = 86400  # 24h
 
+# used by prune_history command: last keep_last versions of every object are always kept, older versions
+# keep one snapshot per day after daily_after_days and are dropped after drop_after_days (None disables rule)
+HISTORY_RETENTION = {
+    'Brand': {'keep_last': 20, 'daily_after_days': 30, 'drop_after_days': None},
+    'Product': {'keep_last': 20, 'daily_after_days': 30, 'drop_after_days': 730},
+    'Review': {'keep_last': 10, 'daily_after_days': 30, 'drop_after_days': 365},
+}
+
+# catalog version used in InitialView ETags lives in cache, so all workers must share one cache backend,
+# without CACHE_BACKEND the database is used (table is created with "python manage.py createcachetable")
+try:
+    CACHES = {
+        'default': {
+            'BACKEND': os.environ["CACHE_BACKEND"],
+            'LOCATION': os.environ["CACHE_LOCATION"],
+        }
+    }
+except KeyError:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'django_cache',
+        }
+    }
+
 FRONTEND_URL = os.environ['FRONTEND_URL']
 
 try: